@@ -11,7 +11,7 @@ import traceback
 from flask import Flask, render_template, request
 from werkzeug.exceptions import HTTPException
 
-from weathermap.datasources.influx import InfluxClient
+from weathermap.datasources.influx import InfluxClient, InfluxClient3
 from weathermap.datasources.snmp import SNMPClient
 from weathermap.api import api, set_datasources, shorten_name
 from weathermap.map import maps, uplinks, map_api, uplink_api
@@ -19,7 +19,11 @@ from config import CircuitConfig, InfluxConfig, SNMPConfig
 
 datasources = []
 try:
-    datasources.append(InfluxClient(InfluxConfig))
+    # use Arrow Flight for historic queries if an InfluxDB 3 host is given
+    if InfluxConfig.get('INFLUX_FLIGHT_HOST'):
+        datasources.append(InfluxClient3(InfluxConfig))
+    else:
+        datasources.append(InfluxClient(InfluxConfig))
 except Exception as e:
     traceback.print_exc()
     print(f"Unable to load InfluxDB datasource: {e}")
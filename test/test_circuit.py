@@ -709,5 +709,33 @@ class TestCircuit(unittest.TestCase):
                 self.assertTrue(segment.datetime > time)
                 time = segment.datetime
 
+    def test_historic_optics_gap(self):
+        # fill the cached link with live data first
+        live = self.circuit.get_optics(['node'])
+        self.assertIsNotNone(live[0].source_optic_rx)
+        # drop the first historic sample on both sides, leaving a gap at the start of the timeline
+        get_historic_optics = self.datasource.get_historic_optics
+        def gap_historic_optics(*args, **kwargs):
+            optics = get_historic_optics(*args, **kwargs)
+            for interfaces in optics.values():
+                for samples in interfaces.values():
+                    samples[0] = None
+            return optics
+        self.datasource.get_historic_optics = gap_historic_optics
+        result = self.circuit.get_optics_timeline(['node'], datetime.now() - timedelta(hours=1), datetime.now())
+        self.assertEqual(len(result), 1)
+        self.assertEqual(len(result[0]), TIMELINE_STEPS)
+        # the gap should stay empty instead of showing the live link's values
+        gap = result[0][0]
+        self.assertIsNotNone(gap.state)
+        self.assertIsNone(gap.source_optic_rx)
+        self.assertIsNone(gap.target_optic_rx)
+        # the time comes from the state sample, not the live data
+        self.assertNotEqual(gap.datetime, live[0].datetime)
+        self.assertTrue(gap.datetime < result[0][1].datetime)
+        for segment in result[0][1:]:
+            self.assertIsNotNone(segment.source_optic_rx)
+            self.assertIsNotNone(segment.datetime)
+
 if __name__ == '__main__':
     unittest.main()
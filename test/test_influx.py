@@ -0,0 +1,259 @@
+import re
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+# update path to include weathermap
+import sys
+sys.path.append("weathermap")
+sys.path.append("weathermap/datasources")
+try:
+    import influx
+    from influxdb.resultset import ResultSet
+except ModuleNotFoundError:
+    # influxdb isn't installed
+    influx = None
+try:
+    import pyarrow as pa
+except ModuleNotFoundError:
+    pa = None
+import datasource
+
+class TestConfig(object):
+    NODE_NAME = "source"
+    METRIC_INTERFACE_NAME = "interface_name"
+    METRIC_INPUT_NAME = "input_data_rate"
+    METRIC_OUTPUT_NAME = "output_data_rate"
+    METRIC_BW_NAME = "bandwidth"
+    METRIC_RECEIVE_NAME = "receive_power"
+    METRIC_TRANSMIT_NAME = "transmit_power"
+    METRIC_LBC_NAME = "laser_bias_current_milli_amps"
+    DESCRIPTION_NAME = "description"
+    COUNTER_PACKET_RX_NAME = "packets_received"
+    COUNTER_CRC_NAME = "crc_errors"
+    COUNTER_INPUT_ERROR_NAME = "input_errors"
+    COUNTER_OUTPUT_DROP_NAME = "output_drops"
+    LINESTATE_NAME = "line_state"
+    HISTORIC_LONG_INTERVAL = 900
+    HISTORIC_SHORT_INTERVAL = 60
+    SETTINGS = {
+        'INFLUX_METRIC_HOST': 'influx.invalid',
+        'INFLUX_METRIC_USERNAME': 'weathermap',
+        'INFLUX_METRIC_PASSWORD': 'weathermap',
+        'INFLUX_METRIC_DATABASE': 'telemetry',
+        'INFLUX_METRIC_MEASUREMENT': 'rates',
+        'INFLUX_OPTIC_MEASUREMENT': 'optics',
+        'INFLUX_DESC_MEASUREMENT': 'descriptions',
+        'INFLUX_COUNTER_MEASUREMENT': 'counters',
+    }
+
+    def get(name, default=None):
+        return TestConfig.SETTINGS.get(name, default)
+
+def series(measurement, node, interface, columns, *values, name=None):
+    """Build a raw InfluxDB series, like the ones in a query response."""
+    tags = {'source': node, 'interface_name': interface} if name is None else {'source': node, 'name': name}
+    return {'name': measurement, 'tags': tags, 'columns': ['time'] + columns, 'values': [list(v) for v in values]}
+
+# historic series for each measurement, every measurement has different nodes and interfaces so mixed up results
+# are easy to spot
+HISTORIC_SERIES = {
+    'descriptions': [
+        series('descriptions', 'node-a', 'Te0/0/0/1', ['desc', 'state'],
+               ('2024-01-01T00:00:00Z', 'to node-b', 'im-state-up'),
+               ('2024-01-01T00:15:00Z', 'to node-b', 'im-state-down')),
+    ],
+    'rates': [
+        series('rates', 'node-a', 'Te0/0/0/2', ['in', 'out', 'bw'],
+               ('2024-01-01T00:00:00Z', 1, 2, 10000000), ('2024-01-01T00:15:00Z', None, None, None)),
+        series('rates', 'node-b', 'Te0/0/0/3', ['in', 'out', 'bw'], ('2024-01-01T00:00:00Z', 3, 4, 10000000)),
+    ],
+    'optics': [
+        series('optics', 'node-a', None, ['rx', 'tx', 'lbc'], ('2024-01-01T00:00:00Z', -210, -150, 3000),
+               name='Optics0/0/0/4'),
+    ],
+    'counters': [
+        series('counters', 'node-b', 'Te0/0/0/5', ['crc', 'inerr', 'inrx', 'outerr'],
+               ('2024-01-01T00:00:00Z', 1, 2, 1000, 3)),
+    ],
+}
+
+def fake_query(query):
+    """Fake InfluxDBClient.query, returning one ResultSet per statement (or a bare ResultSet for one statement)."""
+    results = [ResultSet({'series': HISTORIC_SERIES[re.search(r'FROM "(\w+)"', statement).group(1)]})
+               for statement in query.split('; ')]
+    return (results if len(results) > 1 else results[0])
+
+@unittest.skipIf(influx is None, "influxdb is not installed")
+class TestInfluxClient(unittest.TestCase):
+    """Test functionality from the InfluxDB datasource (query building and result parsing)
+    """
+    def setUp(self):
+        # clients are created without connecting, queries are only sent by the tests that fake them
+        self.client = influx.InfluxClient(TestConfig)
+        # skip the device query
+        self.client._nodes = {node: datasource.Node(node, 'telemetry') for node in ('node-a', 'node-b')}
+        self.endtime = datetime(2024, 1, 1, 1, tzinfo=timezone.utc)
+        self.starttime = self.endtime - timedelta(hours=1)
+
+    def test_prefetch_historic(self):
+        with mock.patch.object(influx.InfluxDBClient, 'query', side_effect=fake_query) as query:
+            self.client.prefetch_historic(['node'], self.starttime, self.endtime,
+                                          kinds=('states', 'rates', 'optics', 'counters'))
+            # every measurement is in the same database, so all statements are sent in one request
+            query.assert_called_once()
+            statements = query.call_args[0][0].split('; ')
+            self.assertEqual([re.search(r'FROM "(\w+)"', statement).group(1) for statement in statements],
+                             ['descriptions', 'rates', 'optics', 'counters'])
+
+            # each cache has the results of its own statement, reading them doesn't query again
+            states = self.client.get_historic_states(['node'], self.starttime, self.endtime)
+            rates = self.client.get_historic_rates(['node'], self.starttime, self.endtime)
+            optics = self.client.get_historic_optics(['node'], self.starttime, self.endtime)
+            counters = self.client.get_historic_counters(['node'], self.starttime, self.endtime)
+            query.assert_called_once()
+
+        self.assertEqual({node: list(interfaces) for node, interfaces in states.items()},
+                         {'node-a': ['Te0/0/0/1'], 'node-b': []})
+        self.assertEqual([state.state for state in states['node-a']['Te0/0/0/1']], ['up', 'down'])
+        self.assertEqual({node: list(interfaces) for node, interfaces in rates.items()},
+                         {'node-a': ['Te0/0/0/2'], 'node-b': ['Te0/0/0/3']})
+        self.assertEqual(rates['node-a']['Te0/0/0/2'][0].in_r, 1000)
+        self.assertIsNone(rates['node-a']['Te0/0/0/2'][1])
+        self.assertEqual(rates['node-b']['Te0/0/0/3'][0].out_r, 4000)
+        self.assertEqual({node: list(interfaces) for node, interfaces in optics.items()},
+                         {'node-a': ['0/0/0/4'], 'node-b': []})
+        self.assertEqual(optics['node-a']['0/0/0/4'][0].rx, -2.1)
+        self.assertEqual({node: list(interfaces) for node, interfaces in counters.items()},
+                         {'node-a': [], 'node-b': ['Te0/0/0/5']})
+        self.assertEqual(counters['node-b']['Te0/0/0/5'][0].crc, 1)
+
+    def test_prefetch_historic_single(self):
+        # a single statement gets a bare ResultSet back instead of a list
+        with mock.patch.object(influx.InfluxDBClient, 'query', side_effect=fake_query) as query:
+            self.client.prefetch_historic(['node-b'], self.starttime, self.endtime, kinds=('rates',))
+            rates = self.client.get_historic_rates(['node-b'], self.starttime, self.endtime)
+            query.assert_called_once()
+        self.assertEqual(list(rates['node-b']), ['Te0/0/0/3'])
+
+    def test_split_by_device(self):
+        raw = {'series': [
+            series('rates', 'node-a', 'Te0/0/0/1', ['in'], ('2024-01-01T00:00:00Z', 1), ('2024-01-01T00:15:00Z', 2)),
+            series('rates', 'node-b', 'Te0/0/0/1', ['in'], ('2024-01-01T00:00:00Z', 3)),
+            series('rates', 'node-a', 'Te0/0/0/2', ['in'], ('2024-01-01T00:00:00Z', 4)),
+            series('rates', 'node-c', 'Te0/0/0/3', ['in'], ('2024-01-01T00:00:00Z', 5)),
+            series('rates', 'node-b', 'Te0/0/0/2', ['in'], ('2024-01-01T00:00:00Z', 6)),
+            series('rates', None, 'Te0/0/0/4', ['in'], ('2024-01-01T00:00:00Z', 7)),
+        ]}
+        # device -> (interface, points) mapping the way it was built from tag dictionaries, without a device tag
+        # there's no node to look the series up with
+        expected_multi = {}
+        for (_, tags), points in ResultSet(raw).items():
+            if tags['source'] is not None:
+                expected_multi.setdefault(tags['source'], []).append((tags['interface_name'], list(points)))
+        expected_single = {node: [(interface, points[0]) for interface, points in results]
+                           for node, results in expected_multi.items()}
+
+        for split, expected in ((self.client._split_by_device_multi, expected_multi),
+                                (self.client._split_by_device_single, expected_single)):
+            result = split(ResultSet(raw))
+            self.assertEqual(list(result), ['node-a', 'node-b', 'node-c'])
+            self.assertEqual({node: [(tags[1], points) for tags, points in results]
+                              for node, results in result.items()}, expected)
+            # tags are ordered node, interface, optic name, optic number
+            self.assertEqual(result['node-b'][1][0], ('node-b', 'Te0/0/0/2', None, None))
+
+    def test_node_filter(self):
+        # exact tag matches, sorted so the same set of nodes always gives the same clause
+        self.assertEqual(influx._node_filter('source', frozenset({'node-b', 'node-a'})),
+                         '("source" = \'node-a\' OR "source" = \'node-b\')')
+        # quotes and backslashes are escaped, so a node name can't end the string literal
+        self.assertEqual(influx._node_filter('source', frozenset({"node-a' OR 1=1 --"})),
+                         '("source" = \'node-a\\\' OR 1=1 --\')')
+        self.assertEqual(influx._node_filter('source', frozenset({'node\\'})), '("source" = \'node\\\\\')')
+
+    def test_historic_node_filter(self):
+        # historic queries use the node filter, and an empty set of nodes doesn't query at all
+        with mock.patch.object(influx.InfluxDBClient, 'query', side_effect=fake_query) as query:
+            self.assertEqual(self.client.get_historic_rates(['unknown'], self.starttime, self.endtime), {})
+            self.client.prefetch_historic(['unknown'], self.starttime, self.endtime, kinds=('rates',))
+            query.assert_not_called()
+            self.client.get_historic_rates(['node-a'], self.starttime, self.endtime)
+            self.assertIn('AND ("source" = \'node-a\')', query.call_args[0][0])
+
+    def test_compacted(self):
+        # results parsed once at cache refresh must match parsing them for every request
+        node_names = ('node-a', 'node-b', 'node-c')
+        for kind, parser, measurement in (
+                ('rates', self.client._parse_rates, 'rates'),
+                ('optics', self.client._parse_optics, 'optics'),
+                ('states', self.client._parse_states, 'descriptions')):
+            # historic results, with timestamps from the query
+            split = lambda *args: self.client._split_by_device_multi(
+                ResultSet({'series': HISTORIC_SERIES[measurement]}))
+            compacted = self.client._compacted(split, **{kind: parser})()
+            self.assertEqual(list(compacted), [kind])
+            self.assertTrue(any(compacted[kind].values()))
+            self.assertEqual(self.client._select(compacted[kind], node_names), parser(node_names, split()))
+
+            # live results, timestamps are the time of parsing so leave them out
+            split = lambda *args: self.client._split_by_device_single(
+                ResultSet({'series': HISTORIC_SERIES[measurement]}))
+            compacted = self.client._compacted(split, **{kind: parser})()
+            without_time = lambda parsed: {
+                node: {interface: point._replace(datetime=None) for interface, point in interfaces.items()}
+                for node, interfaces in parsed.items()}
+            self.assertEqual(without_time(self.client._select(compacted[kind], node_names)),
+                             without_time(parser(node_names, split())))
+
+@unittest.skipIf(influx is None or pa is None, "influxdb or pyarrow is not installed")
+class TestInfluxClient3(unittest.TestCase):
+    """Test functionality from the InfluxDB 3 datasource (Arrow table parsing)
+    """
+    def setUp(self):
+        # clients are created without connecting to anything
+        self.client = influx.InfluxClient(TestConfig)
+
+    def split_table(self, table, query_group):
+        # Flight clients can't be created without a server, only the tag order is needed to split a table
+        return influx.InfluxClient3._split_table(self.client, table, query_group)
+
+    def test_split_table(self):
+        table = pa.table({
+            'iox::measurement': ['rates'] * 5,
+            'time': pa.array([datetime(2024, 1, 1, 0, minute, tzinfo=timezone.utc) for minute in (1, 0, 0, 1, 0)],
+                             pa.timestamp('ns', tz='UTC')),
+            'source': ['node-a', 'node-a', 'node-b', 'node-a', None],
+            'interface_name': ['Te0/0/0/1', 'Te0/0/0/1', 'Te0/0/0/1', 'Te0/0/0/2', 'Te0/0/0/1'],
+            'in': [2.0, 1.0, 3.0, 4.0, 5.0],
+        })
+        result = self.split_table(table, 'GROUP BY time(60s), "source", "interface_name"')
+        # rows with a null device tag are skipped instead of breaking the whole refresh
+        self.assertCountEqual(result.keys(), ['node-a', 'node-b'])
+        self.assertEqual(result['node-a'], [
+            (('node-a', 'Te0/0/0/1', None, None),
+             [{'in': 1.0, 'time': '2024-01-01T00:00:00Z'}, {'in': 2.0, 'time': '2024-01-01T00:01:00Z'}]),
+            (('node-a', 'Te0/0/0/2', None, None), [{'in': 4.0, 'time': '2024-01-01T00:01:00Z'}]),
+        ])
+        self.assertEqual(result['node-b'], [
+            (('node-b', 'Te0/0/0/1', None, None), [{'in': 3.0, 'time': '2024-01-01T00:00:00Z'}]),
+        ])
+
+    def test_split_table_null_interface(self):
+        table = pa.table({
+            'time': pa.array([datetime(2024, 1, 1, tzinfo=timezone.utc)] * 2, pa.timestamp('ns', tz='UTC')),
+            'source': ['node-a', 'node-a'],
+            'interface_name': [None, 'Te0/0/0/1'],
+            'state': ['im-state-up', 'im-state-down'],
+        })
+        result = self.split_table(table, 'GROUP BY time(60s), "source", "interface_name"')
+        self.assertEqual(result['node-a'], [
+            (('node-a', 'Te0/0/0/1', None, None), [{'state': 'im-state-down', 'time': '2024-01-01T00:00:00Z'}]),
+        ])
+        # parsed results only have the interface with a name
+        states = self.client._parse_states(('node-a',), result)
+        self.assertEqual(list(states['node-a']), ['Te0/0/0/1'])
+        self.assertEqual(states['node-a']['Te0/0/0/1'][0].state, 'down')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -32,7 +32,7 @@ class TestLink(unittest.TestCase):
         link2 = Link(self.tgt, self.src)
         self.assertEqual(link1, link2)
         self.assertNotEqual(link1, Interface('node-c', 'Te1/1', 'desc'))
-        self.assertTrue(len(set([link1, link2, self.link])) == 2)
+        self.assertTrue(len(set([link1, link2, self.link])) == 1)
 
     def test_link_get(self):
         self.assertEqual(self.link.get(), (self.src, self.tgt))
@@ -187,5 +187,73 @@ class TestLink(unittest.TestCase):
             'remote': 'remote_desc'
         })
 
+    def test_link_hash(self):
+        # equal links hash the same, data doesn't change the hash
+        link = Link(Interface('node-a', 'Te1/1', 'desc'), Interface('node-b', 'Te2/1', 'desc'))
+        link.set_state(datasource.State('up', 'test', datetime.now()))
+        self.assertEqual(link, self.link)
+        self.assertEqual(hash(link), hash(self.link))
+        self.assertEqual(len({link, self.link}), 1)
+        # links are bidirectional, so the same link found from the other end is deduplicated in a set
+        reverse = Link(self.tgt, self.src)
+        self.assertEqual(reverse, self.link)
+        self.assertEqual(hash(reverse), hash(self.link))
+        self.assertEqual({reverse, self.link, link}, {self.link})
+        # links to a different target aren't equal
+        other = Link(self.src, Interface('node-c', 'Te2/1', 'desc'))
+        self.assertNotEqual(other, self.link)
+        self.assertEqual(len({other, self.link}), 2)
+
+    def test_remote_equality(self):
+        remote = Remote(self.src, 'remote_desc')
+        self.assertEqual(remote, Remote(self.src, 'remote_desc'))
+        self.assertNotEqual(remote, Remote(self.src, 'other_desc'))
+        self.assertNotEqual(remote, Remote(self.tgt, 'remote_desc'))
+        # a Remote is never equal to a Link, even with the same source
+        self.assertNotEqual(remote, Link(self.src, self.tgt))
+        self.assertNotEqual(Link(self.src, self.tgt), remote)
+        # Remotes compare by value but aren't hashable
+        with self.assertRaises(TypeError):
+            hash(remote)
+
+    def test_slots(self):
+        remote = Remote(self.src, 'remote_desc')
+        # fixed attributes only, no per-instance dictionary
+        for obj in (self.link, remote):
+            self.assertFalse(hasattr(obj, '__dict__'))
+            with self.assertRaises(AttributeError):
+                obj.unknown = True
+
+        # asdict only includes attributes that have been set
+        now = datetime.now()
+        self.link.set_state(datasource.State('up', 'test', now))
+        self.link.set_optics(datasource.Optic(-2.0, -3.0, 10.0, 'test', now), None)
+        self.assertEqual(self.link.asdict(), {
+            'source': self.src.node,
+            'target': self.tgt.node,
+            'state': 'up',
+            'datasource': 'test',
+            'source_receive': -2.0,
+            'source_transmit': -3.0,
+            'source_lbc': 10.0,
+            'datetime': self.link.datetime,
+        })
+        remote.set_state(datasource.State('down', 'test', now))
+        self.assertEqual(remote.asdict(), {
+            'source': self.src.node,
+            'remote': 'remote_desc',
+            'state': 'down',
+            'datasource': 'test',
+            'datetime': remote.datetime,
+        })
+
+        # reset clears all link data, but keeps the link ends
+        self.link.reset()
+        self.assertEqual(self.link.get(), (self.src, self.tgt))
+        self.assertEqual(self.link.asdict(), {
+            'source': self.src.node,
+            'target': self.tgt.node,
+        })
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+
+# update path to include weathermap
+import sys
+sys.path.append("weathermap")
+try:
+    import map as weathermap_map
+except ModuleNotFoundError:
+    # flask isn't installed
+    weathermap_map = None
+
+@unittest.skipIf(weathermap_map is None, "flask is not installed")
+class TestMaps(unittest.TestCase):
+    """Test functionality from the Map module (map file discovery and reloading)
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.mapdir = self.tmpdir.name
+        self.maps = weathermap_map.Maps(self.mapdir, self.mapdir)
+        self.write_map('map-a', {'name': 'Map A', 'group': 'group-a'})
+        self.write_map('map-b', {'name': 'Map B', 'group': 'group-a'})
+        # count parsed files, to check that unchanged files are skipped
+        self.parsed = []
+        parse_map = self.maps._parse_map
+        def counting_parse_map(path):
+            self.parsed.append(os.path.basename(path))
+            return parse_map(path)
+        self.maps._parse_map = counting_parse_map
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_map(self, name, content, mtime_ns=None):
+        path = os.path.join(self.mapdir, f"{name}.json")
+        with open(path, 'w') as mapf:
+            mapf.write(content if isinstance(content, str) else json.dumps(content))
+        if mtime_ns is not None:
+            # set the modification time explicitly, some filesystems have coarse timestamps
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def test_read_maps(self):
+        self.assertEqual(self.maps.read_maps(), {'group-a': [('map-a', 'Map A'), ('map-b', 'Map B')]})
+        self.assertCountEqual(self.parsed, ['map-a.json', 'map-b.json'])
+
+    def test_reload_unchanged(self):
+        first = self.maps.read_maps()
+        self.parsed.clear()
+        # nothing changed, so nothing should be parsed again
+        self.assertEqual(self.maps.read_maps(), first)
+        self.assertEqual(self.parsed, [])
+
+    def test_reload_changed(self):
+        self.maps.read_maps()
+        self.parsed.clear()
+        # a new modification time invalidates only that file
+        mtime_ns = os.stat(os.path.join(self.mapdir, 'map-a.json')).st_mtime_ns + 10**9
+        self.write_map('map-a', {'name': 'Map A2', 'group': 'group-b'}, mtime_ns)
+        self.assertEqual(self.maps.read_maps(), {
+            'group-a': [('map-b', 'Map B')],
+            'group-b': [('map-a', 'Map A2')],
+        })
+        self.assertEqual(self.parsed, ['map-a.json'])
+
+    def test_reload_same_mtime(self):
+        self.maps.read_maps()
+        self.parsed.clear()
+        # rewritten with the same modification time, but a different size
+        mtime_ns = os.stat(os.path.join(self.mapdir, 'map-a.json')).st_mtime_ns
+        self.write_map('map-a', {'name': 'Map A, renamed', 'group': 'group-a'}, mtime_ns)
+        self.assertEqual(self.maps.read_maps(), {'group-a': [('map-a', 'Map A, renamed'), ('map-b', 'Map B')]})
+        self.assertEqual(self.parsed, ['map-a.json'])
+
+    def test_reload_added_removed(self):
+        self.maps.read_maps()
+        self.parsed.clear()
+        # new files are parsed, deleted files are dropped
+        self.write_map('map-c', {'name': 'Map C'})
+        os.remove(os.path.join(self.mapdir, 'map-b.json'))
+        self.assertEqual(self.maps.read_maps(), {
+            '': [('map-c', 'Map C')],
+            'group-a': [('map-a', 'Map A')],
+        })
+        self.assertEqual(self.parsed, ['map-c.json'])
+        self.assertNotIn(os.path.join(self.mapdir, 'map-b.json'), self.maps._file_cache)
+
+    def test_reload_invalid(self):
+        self.maps.read_maps()
+        # invalid JSON is skipped, and parsed again once it's fixed
+        mtime_ns = os.stat(os.path.join(self.mapdir, 'map-a.json')).st_mtime_ns
+        self.write_map('map-a', '{"name": ', mtime_ns + 10**9)
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(self.maps.read_maps(), {'group-a': [('map-b', 'Map B')]})
+        self.parsed.clear()
+        self.write_map('map-a', {'name': 'Map A', 'group': 'group-a'}, mtime_ns + 2 * 10**9)
+        self.assertEqual(self.maps.read_maps(), {'group-a': [('map-a', 'Map A'), ('map-b', 'Map B')]})
+        self.assertEqual(self.parsed, ['map-a.json'])
+
+if __name__ == '__main__':
+    unittest.main()
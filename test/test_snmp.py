@@ -0,0 +1,85 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+# update path to include weathermap
+import sys
+sys.path.append("weathermap")
+sys.path.append("weathermap/datasources")
+try:
+    import snmp
+except ModuleNotFoundError:
+    # easysnmp isn't installed
+    snmp = None
+import datasource
+
+class TestConfig(object):
+    NODE_OID = "1.3.6.1.2.1.1.5.0"
+    INTERFACE_NAME_OID = "1.3.6.1.2.1.31.1.1.1.1"
+    INTERFACE_DESC_OID = "1.3.6.1.2.1.31.1.1.1.18"
+    BW_RATE_OID = "1.3.6.1.2.1.31.1.1.1.15"
+    LINK_STATE_OID = "1.3.6.1.2.1.2.2.1.8"
+    IN_RATE_OID = "1.3.6.1.2.1.31.1.1.1.6"
+    OUT_RATE_OID = "1.3.6.1.2.1.31.1.1.1.10"
+    OPTIC_NAME_OID = "1.3.6.1.2.1.47.1.1.1.1.2"
+    OPTIC_SENSOR_OID = "1.3.6.1.4.1.9.9.91.1.1.1.1.4"
+    OPTIC_RX_SENSOR_NAME = "Receive Power Sensor"
+    OPTIC_TX_SENSOR_NAME = "Transmit Power Sensor"
+    OPTIC_LBC_SENSOR_NAME = "Bias Current Sensor"
+    SETTINGS = {'SNMP_HOSTS': '192.0.2.1', 'SNMP_COMMUNITY': 'public'}
+
+    def get(name, default=None):
+        return TestConfig.SETTINGS.get(name, default)
+
+class FakeResult(object):
+    def __init__(self, value, oid=''):
+        self.value = value
+        self.oid = oid
+        self.snmp_type = 'OCTETSTR'
+
+@unittest.skipIf(snmp is None, "easysnmp is not installed")
+class TestSNMPPoller(unittest.TestCase):
+    """Test functionality from the SNMP datasource poller
+    """
+    def setUp(self):
+        session = mock.Mock()
+        session.get.return_value = FakeResult('node-a.example.com')
+        # don't connect to anything or start the polling loop
+        with mock.patch.object(snmp, 'Session', return_value=session), \
+                mock.patch.object(snmp.SNMPPoller, 'start'):
+            self.poller = snmp.SNMPPoller(TestConfig)
+
+    def test_setup(self):
+        self.assertEqual(self.poller.hostnames, {'node-a': '192.0.2.1'})
+        self.assertFalse(self.poller.failed_hosts)
+
+    def test_keep_table(self):
+        # only digits and slashes are kept from optic interface names
+        self.assertEqual('TenGigE0/0/0/1'.translate(snmp._KEEP_TABLE), '0/0/0/1')
+        # non-ASCII characters are removed too, while non-ASCII digits are kept like str.isdigit() does
+        self.assertEqual('Optics0/0/0/1 Émetteur – ﬁbre µ'.translate(snmp._KEEP_TABLE), '0/0/0/1')
+        self.assertEqual('Hu0/1/\u0663\u00b2'.translate(snmp._KEEP_TABLE), '0/1/\u0663\u00b2')
+
+    def test_getters_before_poll(self):
+        # nothing polled yet, so getters return empty results without polling devices themselves
+        with mock.patch.object(self.poller, '_poll_hosts') as poll_hosts:
+            self.assertEqual(self.poller.get_rates('node-a'), {})
+            self.assertEqual(self.poller.get_states('node-a'), {})
+            self.assertEqual(self.poller.get_optics('node-a'), {})
+            poll_hosts.assert_not_called()
+
+    def test_getters_expired(self):
+        state = datasource.State('up', 'snmp', datetime.now())
+        self.poller._poll_cache.set({'rates': {}, 'states': {'node-a': {'Te0/0/0/1': state}}, 'optics': {}})
+        # make the polling results older than the cache timeout
+        self.poller._poll_cache.timestamp[()] -= self.poller._poll_cache.timeout + timedelta(seconds=1)
+        self.assertTrue(self.poller._poll_cache.expired())
+        # only the polling loop should poll devices, getters return the stale results
+        with mock.patch.object(self.poller, '_poll_hosts') as poll_hosts:
+            self.assertEqual(self.poller.get_states('node-a'), {'Te0/0/0/1': state})
+            self.assertEqual(self.poller.get_rates('node-a'), {})
+            self.assertEqual(self.poller.get_optics('node-b'), {})
+            poll_hosts.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
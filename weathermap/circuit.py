@@ -11,6 +11,8 @@ import threading
 from collections import namedtuple
 from copy import copy
 from datetime import datetime, timedelta
+from functools import partial
+from itertools import chain, repeat, starmap
 
 from link import Link, Remote, Interface
 from datasource import Cache, Rate
@@ -19,6 +21,22 @@ class VerificationError(Exception):
     """Error with circuit/description verification."""
     pass
 
+def _timeline_sample(link, setter, state, *samples):
+    """Build a single timeline entry from a Link and one set of samples for a point in time.
+    The sample starts out empty, so missing data stays None instead of showing the cached link's current values.
+
+    :param link: Link object to copy for this point in time.
+    :param setter: Unbound Link setter taking the samples (Link.set_rates, Link.set_health or Link.set_optics).
+    :param state: State sample, or None.
+    :param samples: Samples passed to the setter (Rate, or source and target Counter/Optic), or None.
+    :returns: A new Link object.
+    """
+    sample = copy(link)
+    sample.reset()
+    setter(sample, *samples)
+    sample.set_state(state)
+    return sample
+
 class Circuit(object):
     """Discover connected circuits (nodes and interfaces with a matching node and interface on the other end).
     This is done by comparing interface descriptions and verifying that they match on the other side of the link.
@@ -93,6 +111,28 @@ class Circuit(object):
         """Gather node and interface data and store it in the class."""
         self.nodes = self.merge_datasources('get_nodes')
 
+    def prefetch(self, kinds):
+        """Warm up datasource caches so the per-node lookups that follow don't have to query one after another.
+
+        :param kinds: Live data to fetch, any of "descriptions", "states", "rates", "optics" or "counters".
+        """
+        self.merge_datasources('prefetch', kwargs={'kinds': kinds})
+
+    def prefetch_historic(self, nodelist, starttime, endtime, short_interval, kinds):
+        """Warm up historic datasource caches, so datasources can fetch several kinds of data in one request.
+
+        :param nodelist: A list of node names (full or abbreviated).
+        :param starttime: Beginning time as a Datetime object.
+        :param endtime: End time as a Datetime object.
+        :param short_interval: If True, use short intervals, otherwise use long intervals to improve performance
+        :param kinds: Historic data to fetch, any of "states", "rates", "optics" or "counters".
+        """
+        if not nodelist:
+            return # nothing to fetch, and an empty list would fetch every node
+        self.merge_datasources(
+            'prefetch_historic', args=nodelist,
+            kwargs={'starttime': starttime, 'endtime': endtime, 'short_interval': short_interval, 'kinds': kinds})
+
     def _get_int_id(self, int_name):
         """Get interface ID from an interface name. This removes type or Optic from the string.
 
@@ -462,6 +502,7 @@ class Circuit(object):
         :returns: List of Link objects.
         """
         self.gather_interfaces()
+        self.prefetch(('rates', 'states'))
         if remotes:
             links = self._remote_link_cache.get(tuple(nodelist), tuple(remotes))
         else:
@@ -519,6 +560,7 @@ class Circuit(object):
         timeline_links = []
         # get a list of source nodes first and get historic rates all at once
         node_list = set(link.source.node for link in links)
+        self.prefetch_historic(node_list, starttime, endtime, short_interval, ('rates', 'states'))
         tmp_rates = self.merge_datasources(
             'get_historic_rates', args=node_list,
             kwargs={'starttime': starttime, 'endtime': endtime, 'short_interval': short_interval})
@@ -540,13 +582,10 @@ class Circuit(object):
                 link_states = [None] * len(link_rates)
             elif not link_rates and not link_states:
                 continue # skip this link, no states OR rates available
-            timeline_link = []
             # filter for specific interface
-            for rate, state in zip(link_rates, link_states):
-                link = copy(link)
-                link.set_rates(rate)
-                link.set_state(state)
-                timeline_link.append(link)
+            timeline_link = list(starmap(
+                partial(_timeline_sample, link, Link.set_rates),
+                zip(link_states, link_rates)))
 
             # if we're reading None (no rates found), overwrite with the target side if available
             if not remotes and all(
@@ -560,14 +599,17 @@ class Circuit(object):
                     tmp_states.update(self.merge_datasources(
                         'get_historic_states', args=link.target.node,
                         kwargs={'starttime': starttime, 'endtime': endtime}))
-                for rate in tmp_rates[link.target.node].get(link.target.interface, []):
+                # prefer source side states (like the other timelines), otherwise use the target side
+                if not any(link_states):
+                    link_states = tmp_states.get(link.target.node, {}).get(link.target.interface) or []
+                target_rates = tmp_rates[link.target.node].get(link.target.interface, [])
+                for rate, state in zip(target_rates, chain(link_states, repeat(None))):
                     try:
-                        link = copy(link)
-                        link.set_rates(rate.reverse() if rate else None)
-                        link.set_state(tmp_states[link.target.node].get(link.target.interface, None))
+                        rate = rate.reverse() if rate else None
                     except AttributeError:
                         logging.warn(f'Incorrect rate for {link.target.node} {link.target.interface}')
-                    timeline_link.append(link)
+                        rate = None
+                    timeline_link.append(_timeline_sample(link, Link.set_rates, state, rate))
             if all((tl.in_rate is None and tl.out_rate is None and tl.bandwidth is None) for tl in timeline_link):
                 # no real data found for this link, remove it from the list
                 links.remove(link)
@@ -584,6 +626,7 @@ class Circuit(object):
         :returns: List of Link objects.
         """
         self.gather_interfaces()
+        self.prefetch(('counters', 'states'))
         if remotes:
             links = self._remote_link_cache.get(tuple(nodelist), tuple(remotes))
         else:
@@ -643,6 +686,7 @@ class Circuit(object):
         # also add target nodes for optical data on the other side
         if not remotes:
             node_list.update(link.target.node for link in links)
+        self.prefetch_historic(node_list, starttime, endtime, short_interval, ('counters', 'states'))
         tmp_health = self.merge_datasources(
             'get_historic_counters', args=node_list,
             kwargs={'starttime': starttime, 'endtime': endtime, 'short_interval': short_interval})
@@ -665,13 +709,9 @@ class Circuit(object):
                 # set None, no way to know remote optical data
                 target_health = [None] * len(source_health)
 
-            timeline_link = []
-            for source, target, state in zip(source_health, target_health, source_states):
-                link = copy(link)
-                link.set_health(source, target)
-                link.set_state(state)
-                timeline_link.append(link)
-            timeline_links.append(timeline_link)
+            timeline_links.append(list(starmap(
+                partial(_timeline_sample, link, Link.set_health),
+                zip(source_states, source_health, target_health))))
         return timeline_links
 
     def get_optics(self, nodelist, remotes=False, skip_self=False):
@@ -683,6 +723,7 @@ class Circuit(object):
         :returns: List of Link objects.
         """
         self.gather_interfaces()
+        self.prefetch(('optics', 'states'))
         if remotes:
             links = self._remote_link_cache.get(tuple(nodelist), tuple(remotes))
         else:
@@ -758,6 +799,7 @@ class Circuit(object):
         # also add target nodes for optical data on the other side
         if not remotes:
             node_list.update(link.target.node for link in links)
+        self.prefetch_historic(node_list, starttime, endtime, short_interval, ('optics', 'states'))
         tmp_optics = self.merge_datasources('get_historic_optics', args=node_list,
             kwargs={'starttime': starttime, 'endtime': endtime, 'short_interval': short_interval})
         tmp_states = self.merge_datasources(
@@ -791,11 +833,7 @@ class Circuit(object):
                 # set None, no way to know remote optical data
                 target_optics = [None] * len(source_optics)
 
-            timeline_link = []
-            for source, target, state in zip(source_optics, target_optics, source_states):
-                link = copy(link)
-                link.set_optics(source, target)
-                link.set_state(state)
-                timeline_link.append(link)
-            timeline_links.append(timeline_link)
+            timeline_links.append(list(starmap(
+                partial(_timeline_sample, link, Link.set_optics),
+                zip(source_states, source_optics, target_optics))))
         return timeline_links
@@ -4,26 +4,54 @@
 #
 # by Danial Ebling (danial@uen.org)
 #
-from email import generator
+import asyncio
 import logging
 from collections import namedtuple
 from datetime import datetime, timedelta
 from threading import Event
+from typing import NamedTuple, Optional
 
 STALE_TIMEOUT = 30  # minutes before a node status goes down
 
 # result object NamedTuple - keeps the name of some entry and a time it was pulled
 Result = namedtuple('Result', 'name,refresh')
-# Rate is a special namedtuple - it also includes a function to reverse in and out rates
-class Rate(namedtuple('Rate', 'in_r,out_r,bw,datasource,datetime')):
+
+# datapoint types are built for every interface (and every point in time for historic queries), so keep them as
+# NamedTuples - these don't carry a per-instance __dict__
+class Rate(NamedTuple):
     """Keep track of Interface rates."""
+    in_r: Optional[float]
+    out_r: Optional[float]
+    bw: Optional[float]
+    datasource: str
+    datetime: datetime
+
     def reverse(self):
         """Reverse an interface - swap input and outputs."""
         return Rate(self.out_r, self.in_r, self.bw, self.datasource, self.datetime)
 
-Optic = namedtuple('Optic', 'rx,tx,lbc,datasource,datetime')
-Counter = namedtuple('Counter', 'crc,inerr,inrx,outerr,datasource,datetime')
-State = namedtuple('State', 'state,datasource,datetime')
+class Optic(NamedTuple):
+    """Keep track of Interface optical levels."""
+    rx: Optional[float]
+    tx: Optional[float]
+    lbc: Optional[float]
+    datasource: str
+    datetime: datetime
+
+class Counter(NamedTuple):
+    """Keep track of Interface error counters."""
+    crc: Optional[int]
+    inerr: Optional[int]
+    inrx: Optional[int]
+    outerr: Optional[int]
+    datasource: str
+    datetime: datetime
+
+class State(NamedTuple):
+    """Keep track of Interface states."""
+    state: Optional[str]
+    datasource: str
+    datetime: datetime
 
 class Cache(object):
     """Cache object to keep from repeatedly polling a datasource.
@@ -41,10 +69,27 @@ class Cache(object):
         self.args = args
         self.timeout = timeout
         self.timestamp = {}
-        self.cached = Event()
-        self.cached.set()
+        # set while not updating, one Event per args so updates for different args (devices) don't wait on each other
+        self._cached = {}
         self.datasource = 'unknown'
+        # incremented every time data is refreshed, so users can tell if derived data is out of date
+        self.version = 0
         # note: don't run update() on init, since this could be created before the callback is available
+
+    def _cached_event(self, args):
+        """Get the Event that's set while data for args isn't being updated.
+
+        :param args: Tuple of arguments.
+        :returns: A threading.Event object.
+
+        """
+        event = self._cached.get(args)
+        if event is None:
+            event = Event()
+            event.set()
+            # setdefault is atomic, so threads creating the Event at the same time all get the same one
+            event = self._cached.setdefault(args, event)
+        return event
     
     def expired(self, *args):
         """Determine whether this cache has expired.
@@ -55,11 +100,11 @@ class Cache(object):
         """
         # see if this cached object has expired or not
         # wait 10 seconds if we're currently updating, so we don't accidentally ask for multiple updates
-        wait_success = self.cached.wait(timeout=5)
+        args = (args if args else self.args)
+        wait_success = self._cached_event(args).wait(timeout=5)
         if not wait_success:
             logging.info(f"wait expired on {self.name}, returning stale data")
 
-        args = (args if args else self.args)
         return (not self.timestamp.get(args)
                 or not self.data.get(args)
                 or datetime.now() - self.timeout > self.timestamp[args])
@@ -76,30 +121,64 @@ class Cache(object):
             self.update(*args)
         return self.data.get(args if args else self.args)
 
+    def peek(self, *args):
+        """Get the cached data without refreshing it, even if the cache has expired.
+
+        :param *args: 
+        :returns: The cached data, or None if nothing has been cached yet.
+
+        """
+        return self.data.get(args if args else self.args)
+
+    async def aget(self, *args, executor=None):
+        """Same as get(), but refreshes in an executor so an event loop isn't blocked while waiting on the callback.
+
+        :param *args: 
+        :param executor: concurrent.futures Executor to run in, or None for the event loop's default executor.
+
+        """
+        return await asyncio.get_running_loop().run_in_executor(executor, self.get, *args)
+
     def update(self, *args):
         """Force update the cache.
 
         :param *args: 
 
         """
-        # hold the cached flag so we don't accidentally run many updates at once
-        self.cached.wait(timeout=10)
-        self.cached.clear()
         logging.info(f"cache miss on {self.name}" + (f" ({args})" if args else ""))
         args = (args if args else self.args)
-        # update our data copy, indexed by params so we don't cache the wrong data
-        self.data[args] = self.update_callback(*args)
-        # reset timestamp and cached flag
+        # hold the cached flag so we don't accidentally run many updates at once for the same args
+        cached = self._cached_event(args)
+        cached.wait(timeout=10)
+        cached.clear()
+        try:
+            # update our data copy, indexed by params so we don't cache the wrong data
+            self.data[args] = self.update_callback(*args)
+            # reset timestamp
+            self.timestamp[args] = datetime.now()
+            self.version += 1
+        finally:
+            # always reset the cached flag, so a failed update doesn't hold up later reads
+            cached.set()
+
+    def set(self, data, *args):
+        """Store data without running the callback, for data that was fetched some other way.
+
+        :param data: Data to store.
+        :param *args: 
+
+        """
+        args = (args if args else self.args)
+        self.data[args] = data
         self.timestamp[args] = datetime.now()
-        self.cached.set()
+        self.version += 1
 
     def invalidate(self):
         """Invalidate all cached data.
         """
-        self.cached.wait(timeout=5)
-        self.cached.clear()
+        for cached in list(self._cached.values()):
+            cached.wait(timeout=5)
         self.timestamp = {}
-        self.cached.set()
 
 class Node(object):
     """Describes a router/node and a datasource."""
@@ -107,6 +186,30 @@ class Node(object):
         self.name = name
         self.datasource = datasource
 
+def _match_nodes(known_nodes, nodes):
+    """Match node names against known nodes. Return a list of exact matches, or approximate string matches.
+
+    :param known_nodes: Known node names.
+    :param nodes: A node name, list of node names, or None for all nodes.
+    :returns: A tuple of matching node names.
+
+    """
+    if not nodes:
+        # return all nodes
+        return tuple(known_nodes)
+    if isinstance(nodes, str):
+        # is a string instead of a list of strings, make a 1-element list
+        nodes = [nodes]
+    node_list = []
+    for node_name in nodes:
+        if node_name in known_nodes:
+            # exact match found
+            node_list.append(node_name)
+        elif any(node_name in n_n for n_n in known_nodes):
+            # approximate match(es) found
+            node_list.extend((n_n for n_n in known_nodes if node_name in n_n))
+    return tuple(node_list)
+
 def lookup_node(func):
     """Node lookup decorator. Return a list of exact matches, or approximate string matches.
 
@@ -126,22 +229,30 @@ def lookup_node(func):
         other_args = (args[2:] if len(args) > 2 else [])
         if not _self._nodes:
             _self.get_nodes()
-        known_nodes = _self._nodes.keys()
-        node_list = []
-        if not nodes:
-            # return all nodes
-            return func(_self, tuple(known_nodes), *other_args, **kwargs)
-        if isinstance(nodes, str):
-            # is a string instead of a list of strings, make a 1-element list
-            nodes = [nodes]
-        for node_name in nodes:
-            if node_name in known_nodes:
-                # exact match found
-                node_list.append(node_name)
-            elif any(node_name in n_n for n_n in known_nodes):
-                # approximate match(es) found
-                node_list.extend((n_n for n_n in known_nodes if node_name in n_n))
-        return func(_self, tuple(node_list), *other_args, **kwargs)
+        return func(_self, _match_nodes(_self._nodes.keys(), nodes), *other_args, **kwargs)
+    return wrapper
+
+def alookup_node(func):
+    """Node lookup decorator for coroutines. Same as lookup_node, but the node list is loaded with aget_nodes() so
+    an event loop isn't blocked on a cold node cache.
+
+    :param func: 
+
+    """
+    async def wrapper(*args, **kwargs):
+        """
+
+        :param *args: 
+        :param **kwargs: 
+
+        """
+        # args[0] is self
+        _self = args[0]
+        nodes = (args[1] if len(args) > 1 else None)
+        other_args = (args[2:] if len(args) > 2 else [])
+        if not _self._nodes:
+            await _self.aget_nodes()
+        return await func(_self, _match_nodes(_self._nodes.keys(), nodes), *other_args, **kwargs)
     return wrapper
 
 class DataSource(object):
@@ -166,6 +277,26 @@ class DataSource(object):
 
         """
         raise NotImplementedError()
+
+    async def aget_nodes(self) -> dict:
+        """Async version of get_nodes(). Datasources with a cached node query should override this, otherwise
+        get_nodes() is run in the event loop's default executor.
+
+        :returns: A dictionary of Node objects, keyed by node names.
+
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_nodes)
+
+    def prefetch(self, kinds=()) -> dict:
+        """Warm up any cached queries before a batch of get_* calls. Datasources that can refresh their caches in
+        parallel should override this, otherwise nothing is done.
+
+        :param kinds: Live data to fetch, any of "descriptions", "states", "rates", "optics" or "counters".
+        (Default value = ())
+        :returns: An empty dictionary, so this can be run with Circuit.merge_datasources().
+
+        """
+        return {}
     
     @lookup_node
     def get_descriptions(self, node_names) -> dict:
@@ -189,6 +320,21 @@ class DataSource(object):
         """
         raise NotImplementedError()
 
+    def prefetch_historic(self, node_names, starttime=None, endtime=None, short_interval=False, kinds=()) -> dict:
+        """Warm up historic queries for the same nodes and time range before get_historic_* calls. Datasources that
+        can fetch several kinds of historic data at once should override this, otherwise nothing is done.
+
+        :param node_names: List of node names to query.
+        :param starttime: Beginning time as a datetime object. (Default value = None)
+        :param endtime: End time as a datetime object. (Default value = None)
+        :param short_interval: If True, use short intervals, otherwise use long intervals as defined in the config.
+        (Default value = False)
+        :param kinds: Historic data to fetch, any of "states", "rates", "optics" or "counters". (Default value = ())
+        :returns: An empty dictionary, so this can be run with Circuit.merge_datasources().
+
+        """
+        return {}
+
     @lookup_node
     def get_historic_states(self, node_names, starttime=None, endtime=None, short_interval=False) -> dict:
         """Get a list of historical interface states for a specific node, matching nodes or all nodes.
@@ -1,12 +1,78 @@
+import socket
 import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from functools import lru_cache
 from influxdb import InfluxDBClient
 from os import path
 from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+try:
+    # optional, only used by InfluxClient3
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from influxdb_client_3 import InfluxDBClient3
+except ImportError:
+    InfluxDBClient3 = None
+
+# update syspath to enable relative imports. datasource is imported as a top-level module everywhere (circuit.py,
+# link.py, tests), so it has to be imported the same way here or Rate/State/etc. would be different classes. only add
+# the path once, even if this module is reloaded
+_WEATHERMAP_PATH = path.dirname(path.dirname(path.realpath(__file__)))
+if _WEATHERMAP_PATH not in sys.path:
+    sys.path.append(_WEATHERMAP_PATH)
+from datasource import Cache, DataSource, Node, Rate, Optic, Counter, State, alookup_node, lookup_node
+
+# connection settings that are passed through to InfluxDBClient
+CLIENT_PARAMS = frozenset({'host', 'port', 'username', 'password', 'database', 'session'})
+# Arrow columns that are neither tags nor fields
+_ARROW_SKIP = frozenset({'time', 'iox::measurement'})
+# enable TCP keepalives, so idle pooled connections survive between polls instead of being dropped by firewalls
+_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+    (socket.IPPROTO_TCP, getattr(socket, option), value)
+    for option, value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 15), ('TCP_KEEPCNT', 4))
+    if hasattr(socket, option)]
+# IOS-XR line states and their Weathermap equivalents
+_STATE_MAP = {
+    "im-state-up": "up",
+    "im-state-down": "down",
+    "im-state-admin-down": "shut",
+    "im-state-err-disable": "errdisable",
+}
+
+@lru_cache(maxsize=4096)
+def _parse_time(timestamp):
+    """Parse an RFC3339 timestamp returned by InfluxDB. Grouped queries repeat the same bucket times for every
+    interface, so results are cached.
+
+    :param timestamp: Timestamp as a string, like 2022-01-01T00:00:00Z
+    :returns: A timezone-aware datetime object.
+    """
+    # fromisoformat() only accepts a trailing Z on Python 3.11+
+    if timestamp.endswith('Z'):
+        timestamp = timestamp[:-1] + '+00:00'
+    return datetime.fromisoformat(timestamp)
+
+@lru_cache(maxsize=256)
+def _node_filter(node_key, node_names):
+    """Build a WHERE clause matching a set of nodes. Exact tag matches are resolved with InfluxDB's tag index
+    instead of running a regex against every series. Node sets are usually repeated, so results are cached.
+
+    :param node_key: Node tag name as a string.
+    :param node_names: frozenset of node names, which must not be empty.
+    :returns: A WHERE clause fragment as a string.
+    """
+    # escape backslashes and quotes, so node names can't break out of the string literal
+    escaped = (node.replace('\\', '\\\\').replace("'", "\\'") for node in sorted(node_names))
+    return '(' + ' OR '.join(f'"{node_key}" = \'{node}\'' for node in escaped) + ')'
 
-# update syspath to enable relative imports
-sys.path.append(path.dirname(path.dirname(path.realpath(__file__))))
-from datasource import Cache, DataSource, Node, Rate, Optic, Counter, State, lookup_node
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that sets TCP keepalive options on pooled connections."""
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = _SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
 
 class InfluxClient(DataSource):
     """InfluxDB Data source.
@@ -21,6 +87,11 @@ class InfluxClient(DataSource):
             raise Exception("Missing Influx config (does config.py exist and contain InfluxConfig?)")
         # keep field/cache config separate from database config
         self.config = config
+        # bind frequently used field keys once, these are looked up for every returned series
+        self._iface_key = config.METRIC_INTERFACE_NAME
+        self._node_key = config.NODE_NAME
+        # tags are stored as tuples in this order, so parsers can index them instead of looking up keys
+        self._tag_keys = (self._node_key, self._iface_key, 'name', 'number')
         super().__init__(config)
         self.datasource = 'telemetry'
 
@@ -59,32 +130,43 @@ class InfluxClient(DataSource):
         :param config: Configuration to pass to setup/connection.
 
         """
-        client_params = ['host', 'port', 'username', 'password', 'database', 'session']
         # Create a shared session for performance
         self._session = Session()
+        # thread pool for refreshing caches in parallel (queries are network bound)
+        self._executor = ThreadPoolExecutor(max_workers=8)
 
         # Create the InfluxDB client connection for metrics (input/output counters, bandwidth)
         metric_settings = self.get_config(config, 'metric', session=self._session)
         self._metric_connection = InfluxDBClient(
-            **dict(filter(lambda k: k[0] in client_params, metric_settings.items())))
+            **{k: v for k, v in metric_settings.items() if k in CLIENT_PARAMS})
         
         # Create the InfluxDB client connection for optics (receive/transmit power, LBC)
         optic_settings = self.get_config(config, 'optic', session=self._session, default=metric_settings)
         self._optic_connection = InfluxDBClient(
-            **dict(filter(lambda k: k[0] in client_params, metric_settings.items())))
+            **{k: v for k, v in optic_settings.items() if k in CLIENT_PARAMS})
 
         # Create the InfluxDB client connection for interface descriptions
         description_settings = self.get_config(config, 'desc', session=self._session, default=metric_settings)
         self._description_connection = InfluxDBClient(
-            **dict(filter(lambda k: k[0] in client_params, description_settings.items())))
+            **{k: v for k, v in description_settings.items() if k in CLIENT_PARAMS})
 
         # Create the InfluxDB client connection for counters (error counters, bytes/packets)
         counter_settings = self.get_config(config, 'counter', session=self._session, default=metric_settings)
         self._counter_connection = InfluxDBClient(
-            **dict(filter(lambda k: k[0] in client_params, counter_settings.items())))
+            **{k: v for k, v in counter_settings.items() if k in CLIENT_PARAMS})
+
+        # size the connection pool for concurrent queries across all four clients - this is mounted after the
+        # clients are created, since each InfluxDBClient mounts its own (default 10 connection) adapter
+        adapter = _KeepAliveAdapter(pool_connections=16, pool_maxsize=32, pool_block=False, max_retries=2)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
 
         # set queries as Cache objects, so data can be kept locally instead of having to query the database every time
         group_by = f'GROUP BY "{self.config.NODE_NAME}", "{self.config.METRIC_INTERFACE_NAME}"'
+        optic_group_by = f'GROUP BY "{self.config.NODE_NAME}", "name", "number"'
+        # historic GROUP BY clauses only need the interval (in seconds) substituted in
+        self._historic_group = f'GROUP BY time(%ds), "{self.config.NODE_NAME}", "{self.config.METRIC_INTERFACE_NAME}"'
+        self._historic_optic_group = f'GROUP BY time(%ds), "{self.config.NODE_NAME}", "name", "number"'
         self._metric_interval = metric_settings['interval'] * 5
         metric_interval_query = f"(time > now() - {self._metric_interval}s)"
         optic_interval_query = f"(time > now() - {optic_settings['interval'] * 5}s)"
@@ -99,7 +181,7 @@ class InfluxClient(DataSource):
             f'SHOW TAG VALUES FROM "{metric_settings["measurement"]}" WITH KEY = "{self.config.NODE_NAME}"')
         self._rate_query = Cache(
             'rates',
-            self._query_by_device, self._metric_connection,
+            self._compacted(self._query_by_device_single, rates=self._parse_rates), self._metric_connection,
             f'SELECT last("{self.config.METRIC_INPUT_NAME}") AS "in", '
             f'last("{self.config.METRIC_OUTPUT_NAME}") AS "out", '
             f'last("{self.config.METRIC_BW_NAME}") AS "bw" '
@@ -108,7 +190,7 @@ class InfluxClient(DataSource):
         # separate cache for historic rates so we can have a longer timeout
         self._historic_rate_query = Cache(
             'historic-rates',
-            self._query_by_device, self._metric_connection,
+            self._compacted(self._query_by_device_multi, rates=self._parse_rates), self._metric_connection,
             f'SELECT last("{self.config.METRIC_INPUT_NAME}") AS "in", '
             f'last("{self.config.METRIC_OUTPUT_NAME}") AS "out", '
             f'last("{self.config.METRIC_BW_NAME}") AS "bw" '
@@ -116,39 +198,41 @@ class InfluxClient(DataSource):
             timeout=timedelta(seconds=self.config.HISTORIC_LONG_INTERVAL))
         self._optic_query = Cache(
             'optics',
-            self._query_by_device, self._optic_connection,
+            self._compacted(self._query_by_device_single, optics=self._parse_optics), self._optic_connection,
             f'SELECT last("{self.config.METRIC_RECEIVE_NAME}") AS "rx", '
             f'last("{self.config.METRIC_TRANSMIT_NAME}") AS "tx", '
             f'last("{self.config.METRIC_LBC_NAME}") AS "lbc" '
             f'FROM "{optic_settings["measurement"]}" WHERE ',
-            optic_interval_query, f'GROUP BY "{self.config.NODE_NAME}", "name", "number"', 'LIMIT 1',
+            optic_interval_query, optic_group_by, 'LIMIT 1',
             timeout=timedelta(seconds=optic_settings['interval'] * 2))
         self._historic_optic_query = Cache(
             'historic-optics',
-            self._query_by_device, self._optic_connection,
+            self._compacted(self._query_by_device_multi, optics=self._parse_optics), self._optic_connection,
             f'SELECT last("{self.config.METRIC_RECEIVE_NAME}") AS "rx", '
             f'last("{self.config.METRIC_TRANSMIT_NAME}") AS "tx", '
             f'last("{self.config.METRIC_LBC_NAME}") AS "lbc" '
             f'FROM "{optic_settings["measurement"]}" WHERE ',
-            optic_interval_query, f'GROUP BY "{self.config.NODE_NAME}", "name", "number"', '',
+            optic_interval_query, optic_group_by, '',
             timeout=timedelta(seconds=self.config.HISTORIC_LONG_INTERVAL))
         self._description_query = Cache(
             'descriptions',
-            self._query_by_device, self._description_connection,
+            self._compacted(
+                self._query_by_device_single, descriptions=self._parse_descriptions, states=self._parse_states),
+            self._description_connection,
             f'SELECT last("{self.config.DESCRIPTION_NAME}") AS "desc", '
             f'last("{self.config.LINESTATE_NAME}") AS "state" '
             f'FROM "{description_settings["measurement"]}" WHERE ', description_interval, group_by, 'LIMIT 1',
             timeout=timedelta(seconds=description_settings['interval'])) # also extended description cache timeout
         self._historic_description_query = Cache(
             'historic-descriptions',
-            self._query_by_device, self._description_connection,
+            self._compacted(self._query_by_device_multi, states=self._parse_states), self._description_connection,
             f'SELECT last("{self.config.DESCRIPTION_NAME}") AS "desc", '
             f'last("{self.config.LINESTATE_NAME}") AS "state" '
             f'FROM "{description_settings["measurement"]}" WHERE ', None, group_by, '',
             timeout=timedelta(seconds=self.config.HISTORIC_LONG_INTERVAL))
         self._counter_query = Cache(
             'counters',
-            self._query_by_device, self._counter_connection,
+            self._compacted(self._query_by_device_single, counters=self._parse_counters), self._counter_connection,
             f'SELECT last("{self.config.COUNTER_CRC_NAME}") - first("{self.config.COUNTER_CRC_NAME}") AS "crc", '
             f'last("{self.config.COUNTER_INPUT_ERROR_NAME}") - first("{self.config.COUNTER_INPUT_ERROR_NAME}") AS "inerr", '
             f'last("{self.config.COUNTER_PACKET_RX_NAME}") - first("{self.config.COUNTER_PACKET_RX_NAME}") AS "inrx", '
@@ -157,7 +241,7 @@ class InfluxClient(DataSource):
             timeout=timedelta(seconds=counter_settings['interval']))
         self._historic_counter_query = Cache(
             'historic-counters',
-            self._query_by_device, self._counter_connection,
+            self._compacted(self._query_by_device_multi, counters=self._parse_counters), self._counter_connection,
             f'SELECT last("{self.config.COUNTER_CRC_NAME}") - first("{self.config.COUNTER_CRC_NAME}") AS "crc", '
             f'last("{self.config.COUNTER_INPUT_ERROR_NAME}") - first("{self.config.COUNTER_INPUT_ERROR_NAME}") AS "inerr", '
             f'last("{self.config.COUNTER_PACKET_RX_NAME}") - first("{self.config.COUNTER_PACKET_RX_NAME}") AS "inrx", '
@@ -165,9 +249,82 @@ class InfluxClient(DataSource):
             f'FROM "{counter_settings["measurement"]}" WHERE ', None, group_by, '',
             timeout=timedelta(seconds=self.config.HISTORIC_LONG_INTERVAL))
 
-    def _query_by_device(self, connection, query, query_time, query_group, query_limit):
+        # live caches by data type, used to prefetch only what a batch of get_* calls needs
+        self._live_queries = {
+            'descriptions': self._description_query,
+            'states': self._description_query,
+            'rates': self._rate_query,
+            'optics': self._optic_query,
+            'counters': self._counter_query,
+        }
+        # historic caches, GROUP BY templates and parsers by data type, used to batch historic queries together
+        self._historic_queries = {
+            'states': (self._historic_description_query, self._historic_group, self._parse_states),
+            'rates': (self._historic_rate_query, self._historic_group, self._parse_rates),
+            'optics': (self._historic_optic_query, self._historic_optic_group, self._parse_optics),
+            'counters': (self._historic_counter_query, self._historic_group, self._parse_counters),
+        }
+        # keep track of which connections share a database
+        self._databases = {
+            connection: (settings['host'], settings['port'], settings['database'])
+            for connection, settings in (
+                (self._metric_connection, metric_settings),
+                (self._optic_connection, optic_settings),
+                (self._description_connection, description_settings),
+                (self._counter_connection, counter_settings))}
+
+    def _compacted(self, query, **parsers):
+        """Wrap a query function for a Cache, so results are parsed once when the cache is refreshed instead of
+        every time they're read.
+
+        :param query: Query function, like _query_by_device_single.
+        :param **parsers: Parsing functions keyed by data type, each called with node_names and the query results.
+        :returns: A callback function for a Cache object.
+
+        """
+        def callback(*args):
+            return self._compact(parsers, query(*args))
+        return callback
+
+    def _compact(self, parsers, noderesult):
+        """Parse query results for every node they contain.
+
+        :param parsers: Dictionary of parsing functions keyed by data type.
+        :param noderesult: Query results keyed by node name.
+        :returns: A dictionary of parsed results keyed by data type.
+
+        """
+        node_names = tuple(noderesult)
+        return {kind: parser(node_names, noderesult) for kind, parser in parsers.items()}
+
+    def _select(self, parsed, node_names):
+        """Pick nodes out of parsed results. Results are shared between callers and should not be modified.
+
+        :param parsed: Parsed results keyed by node name.
+        :param node_names: List of node names to return.
+        :returns: A dictionary keyed by node name, with an empty dictionary for nodes without data.
+
+        """
+        return {node_name: parsed.get(node_name, {}) for node_name in node_names}
+
+    def _query_by_device_single(self, connection, query, query_time, query_group, query_limit):
         """Very similar to InfluxDBClient.query, except it returns a dictionary keyed by node name.
-        This makes subsequent sorting and searches much faster.
+        This makes subsequent sorting and searches much faster. Only the first point of each series is kept, so this
+        is used for the LIMIT 1 queries.
+
+        :param connection: an InfluxDBClient object to use for the database connection.
+        :param query: SELECT portion of the query to pass through as a string.
+        :param query_time: Time portion of the query (WHERE TIME > ...) to pass through as a string.
+        :param query_group: Group portion of the query (GROUP BY ...) to pass through as a string.
+        :param query_limit: Limit portion of the query (LIMIT ...) to pass through as a string.
+
+        """
+        queryresult = connection.query(query + f' {query_time} {query_group} {query_limit}')
+        return self._split_by_device_single(queryresult)
+
+    def _query_by_device_multi(self, connection, query, query_time, query_group, query_limit):
+        """Same as _query_by_device_single, except every point of each series is kept, so this is used for the
+        historic queries.
 
         :param connection: an InfluxDBClient object to use for the database connection.
         :param query: SELECT portion of the query to pass through as a string.
@@ -177,15 +334,196 @@ class InfluxClient(DataSource):
 
         """
         queryresult = connection.query(query + f' {query_time} {query_group} {query_limit}')
-        noderesult = {}
-        for result in queryresult.items():
-            # result[0] are tags, result[1] are fields
-            node_name = result[0][1].get(self.config.NODE_NAME)
-            if node_name not in noderesult:
-                noderesult[node_name] = []
-            noderesult[node_name].append((result[0], (next(result[1]) if query_limit else list(result[1]))))
+        return self._split_by_device_multi(queryresult)
+
+    def _split_by_device_single(self, queryresult):
+        """Split an InfluxDB ResultSet into a dictionary keyed by node name, keeping the first point of each series.
+        Each series is stored as a (tags, points) tuple, where tags are ordered like self._tag_keys.
+
+        :param queryresult: ResultSet returned from InfluxDBClient.query.
+
+        """
+        tag_keys = self._tag_keys
+        intern = sys.intern
+        noderesult = defaultdict(list)
+        for (_, tags), points in queryresult.items():
+            tags = tuple(map(tags.get, tag_keys))
+            if tags[0] is None:
+                continue # no device tag, can't belong to any node
+            noderesult[intern(tags[0])].append((tags, next(points)))
+        return noderesult
+
+    def _split_by_device_multi(self, queryresult):
+        """Split an InfluxDB ResultSet into a dictionary keyed by node name, keeping every point of each series.
+
+        :param queryresult: ResultSet returned from InfluxDBClient.query.
+
+        """
+        tag_keys = self._tag_keys
+        intern = sys.intern
+        noderesult = defaultdict(list)
+        for (_, tags), points in queryresult.items():
+            tags = tuple(map(tags.get, tag_keys))
+            if tags[0] is None:
+                continue # no device tag, can't belong to any node
+            noderesult[intern(tags[0])].append((tags, list(points)))
         return noderesult
 
+    def _batch_query(self, connection, statements):
+        """Run multiple statements in a single request. InfluxDB returns results in statement order.
+
+        :param connection: an InfluxDBClient object to use for the database connection.
+        :param statements: List of full query statements as strings.
+        :returns: A list of ResultSet objects, one for each statement.
+
+        """
+        results = connection.query('; '.join(statements))
+        # a single statement returns a bare ResultSet instead of a list
+        return (results if isinstance(results, list) else [results])
+
+    def _historic_args(self, cache, group, node_names, starttime, endtime, short_interval):
+        """Build Cache arguments for a historic query over a time range.
+
+        :param cache: Historic Cache object, its default args are used as a template.
+        :param group: GROUP BY template with a %d placeholder for the interval.
+        :param node_names: List of node names to query.
+        :param starttime: Beginning time as a datetime object.
+        :param endtime: End time as a datetime object.
+        :param short_interval: If True, use short intervals, otherwise use long intervals as defined in the config.
+        :returns: A tuple of arguments for the cache's get() function.
+
+        """
+        if not isinstance(starttime, datetime) or not isinstance(endtime, datetime):
+            raise ValueError("starttime and endtime must be datetime objects")
+        # get existing args, modify for intervals and previous data
+        args = cache.args
+        # multiply time to get nanosecond precision
+        # also filter for specific sources - less likely to hit cache, but query time is faster
+        filter_query = (f'time > {int(starttime.timestamp() * 1000000000)}'
+                        f' AND time < {int(endtime.timestamp() * 1000000000)}'
+                        f' AND {_node_filter(self._node_key, frozenset(node_names))}')
+        interval = (self.config.HISTORIC_SHORT_INTERVAL if short_interval else self.config.HISTORIC_LONG_INTERVAL)
+        return (args[0], args[1], filter_query, group % interval, args[4])
+
+    def _historic(self, kind, node_names, starttime, endtime, short_interval):
+        """Get parsed historic data for a time range, shared by the get_historic_* functions.
+
+        :param kind: Historic data type, one of "states", "rates", "optics" or "counters".
+        :param node_names: List of node names to query.
+        :param starttime: Beginning time as a datetime object.
+        :param endtime: End time as a datetime object.
+        :param short_interval: If True, use short intervals, otherwise use long intervals as defined in the config.
+        :returns: Parsed results keyed by node name.
+
+        """
+        if not node_names:
+            return {} # no nodes in this datasource, and an empty node filter isn't valid InfluxQL
+        cache, group, _ = self._historic_queries[kind]
+        parsed = cache.get(*self._historic_args(cache, group, node_names, starttime, endtime, short_interval))
+        return self._select(parsed[kind], node_names)
+
+    @lookup_node
+    def prefetch_historic(self, node_names, starttime=None, endtime=None, short_interval=False, kinds=()) -> dict:
+        """Fill historic caches for the same nodes and time range with as few requests as possible. Queries that
+        go to the same InfluxDB database are sent together in one request, and results are stored in their caches
+        so the following get_historic_* calls don't have to query again.
+
+        :param node_names: List of node names to query.
+        :param starttime: Beginning time as a datetime object. (Default value = None)
+        :param endtime: End time as a datetime object. (Default value = None)
+        :param short_interval: If True, use short intervals, otherwise use long intervals as defined in the config.
+        (Default value = False)
+        :param kinds: Historic data to fetch, any of "states", "rates", "optics" or "counters". (Default value = ())
+        :returns: An empty dictionary, so this can be run with Circuit.merge_datasources().
+
+        """
+        if not node_names:
+            return {} # nothing to fetch, and an empty node filter isn't valid InfluxQL
+        batches = {} # keyed by database, so only compatible statements are sent together
+        for kind in kinds:
+            cache, group, parser = self._historic_queries[kind]
+            args = self._historic_args(cache, group, node_names, starttime, endtime, short_interval)
+            if cache.expired(*args):
+                batches.setdefault(self._databases[args[0]], []).append((cache, {kind: parser}, args))
+
+        for batch in batches.values():
+            # every entry in a batch points at the same database, so any of the connections will do
+            results = self._batch_query(batch[0][2][0], [f'{a[1]} {a[2]} {a[3]} {a[4]}' for _, _, a in batch])
+            for (cache, parsers, args), result in zip(batch, results):
+                cache.set(self._compact(parsers, self._split_by_device_multi(result)), *args)
+        return {}
+
+    def prefetch(self, kinds=()) -> dict:
+        """Refresh the live caches for the requested kinds of data in parallel, so subsequent get_* calls only
+        wait on the slowest query instead of all of them in a row.
+
+        :param kinds: Live data to fetch, any of "descriptions", "states", "rates", "optics" or "counters".
+        (Default value = ())
+        :returns: An empty dictionary, so this can be run with Circuit.merge_datasources().
+
+        """
+        # descriptions and states share a query, so only refresh each cache once
+        wait([self._executor.submit(cache.get) for cache in {self._live_queries[kind] for kind in kinds}])
+        return {}
+
+    async def _aselect(self, cache, kind, node_names):
+        """Get parsed results from a live query cache. The cache is refreshed in the thread pool so an event loop
+        isn't blocked while InfluxDB is queried.
+
+        :param cache: Cache object to get parsed results from.
+        :param kind: Data type to read from the cache.
+        :param node_names: Tuple of node names to return.
+        :returns: Parsed results keyed by node name.
+
+        """
+        parsed = await cache.aget(executor=self._executor)
+        return self._select(parsed[kind], node_names)
+
+    @alookup_node
+    async def aget_descriptions(self, node_names) -> dict:
+        """Async version of get_descriptions().
+
+        :param node_names: List of node names to query.
+
+        """
+        return await self._aselect(self._description_query, 'descriptions', node_names)
+
+    @alookup_node
+    async def aget_states(self, node_names) -> dict:
+        """Async version of get_states().
+
+        :param node_names: List of node names to query.
+
+        """
+        return await self._aselect(self._description_query, 'states', node_names)
+
+    @alookup_node
+    async def aget_rates(self, node_names) -> dict:
+        """Async version of get_rates().
+
+        :param node_names: List of node names to query.
+
+        """
+        return await self._aselect(self._rate_query, 'rates', node_names)
+
+    @alookup_node
+    async def aget_optics(self, node_names) -> dict:
+        """Async version of get_optics().
+
+        :param node_names: List of node names to query.
+
+        """
+        return await self._aselect(self._optic_query, 'optics', node_names)
+
+    @alookup_node
+    async def aget_counters(self, node_names) -> dict:
+        """Async version of get_counters().
+
+        :param node_names: List of node names to query.
+
+        """
+        return await self._aselect(self._counter_query, 'counters', node_names)
+
     def get_nodes(self) -> dict:
         """Get a list of nodes from the datasource.
 
@@ -195,10 +533,28 @@ class InfluxClient(DataSource):
         """
         # update the local node list if expired
         if self._device_query.expired():
-            nodes = (i['value'] for i in self._device_query.get().get_points())
-            for node in nodes:
-                if node not in self._nodes:
-                    self._nodes[node] = Node(node, self.datasource)
+            self._add_nodes(self._device_query.get())
+        return self._nodes
+
+    async def aget_nodes(self) -> dict:
+        """Async version of get_nodes(). The device query is refreshed in the thread pool, so an event loop isn't
+        blocked on a cold node cache.
+
+        :returns: A dictionary of Node objects, keyed by node names.
+
+        """
+        return self._add_nodes(await self._device_query.aget(executor=self._executor))
+
+    def _add_nodes(self, result):
+        """Add nodes from a device query result to the local node list.
+
+        :param result: ResultSet from the device query.
+        :returns: A dictionary of Node objects, keyed by node names.
+
+        """
+        for node in (sys.intern(i['value']) for i in result.get_points()):
+            if node not in self._nodes:
+                self._nodes[node] = Node(node, self.datasource)
         return self._nodes
 
     @lookup_node
@@ -210,16 +566,21 @@ class InfluxClient(DataSource):
         inner dictionary is keyed by interface ID.
 
         """
-        desc_data = self._description_query.get()
+        return self._select(self._description_query.get()['descriptions'], node_names)
+
+    def _parse_descriptions(self, node_names, query_data):
+        """
+
+        :param node_names: param query_data:
+        :param query_data: 
+
+        """
+        intern = sys.intern
         descriptions = {}
         for node_name in node_names:
-            descriptions[node_name] = {}
-            for result in desc_data.get(node_name, []):
-                try:
-                    points = result[1]
-                    descriptions[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)] = points.get('desc')
-                except TypeError:
-                    continue # problem getting metrics (None was returned instead of an int), skip
+            node_descriptions = descriptions[node_name] = {}
+            for result in query_data.get(node_name, []):
+                node_descriptions[intern(result[0][1])] = result[1].get('desc')
         return descriptions
 
     def _rewrite_state(self, state):
@@ -228,14 +589,7 @@ class InfluxClient(DataSource):
         :param state: 
 
         """
-        if state == "im-state-up":
-            return "up"
-        elif state == "im-state-down":
-            return "down"
-        elif state == "im-state-admin-down":
-            return "shut"
-        elif state == "im-state-err-disable":
-            return "errdisable"
+        return _STATE_MAP.get(state)
 
     def _parse_states(self, node_names, query_data):
         """
@@ -244,30 +598,29 @@ class InfluxClient(DataSource):
         :param query_data: 
 
         """
+        intern = sys.intern
+        ds = self.datasource
+        parse_ts = _parse_time
         states = {}
         for node_name in node_names:
-            states[node_name] = {}
+            node_states = states[node_name] = {}
             for result in query_data.get(node_name, []):
-                try:
-                    points = result[1]
-                    if isinstance(points, dict):
-                        # only one item returned without a timestamp, store a single datapoint
-                        state = self._rewrite_state(points.get('state'))
-                        states[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)] = State(
-                            state, self.datasource, datetime.now())
-                    else:
-                        # multiple items returned, store a list of datapoints
-                        states[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)] = []
-                        for point in points:
-                            state = self._rewrite_state(point.get('state'))
-                            if state is None:
-                                states[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)].append(None)
-                            else:
-                                states[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)].append(State(
-                                    state, self.datasource,
-                                    datetime.strptime(point.get('time'), "%Y-%m-%dT%H:%M:%S%z")))
-                except TypeError:
-                    continue # problem getting metrics, continue
+                points = result[1]
+                # interface names repeat across every query and node, intern them so dict keys share storage
+                iface = intern(result[0][1])
+                if isinstance(points, dict):
+                    # only one item returned without a timestamp, store a single datapoint
+                    state = self._rewrite_state(points.get('state'))
+                    node_states[iface] = State(state, ds, datetime.now())
+                else:
+                    # multiple items returned, store a list of datapoints
+                    iface_states = node_states[iface] = []
+                    for point in points:
+                        state = self._rewrite_state(point.get('state'))
+                        if state is None:
+                            iface_states.append(None)
+                        else:
+                            iface_states.append(State(state, ds, parse_ts(point.get('time'))))
         return states
 
     @lookup_node
@@ -279,7 +632,7 @@ class InfluxClient(DataSource):
         name, inner dictionary is keyed by interface ID.
 
         """
-        return self._parse_states(node_names, self._description_query.get())
+        return self._select(self._description_query.get()['states'], node_names)
     
     @lookup_node
     def get_historic_states(self, node_names, starttime=None, endtime=None, short_interval=False) -> dict:
@@ -295,24 +648,7 @@ class InfluxClient(DataSource):
         timestamp.
 
         """
-        if not isinstance(starttime, datetime) or not isinstance(endtime, datetime):
-            raise ValueError("starttime and endtime must be datetime objects")
-        # get existing args, modify for intervals and previous data
-        args = list(self._historic_description_query.args)
-        # multiply time to get nanosecond precision
-        # also filter for specific sources - less likely to hit cache, but query time is faster
-        filter_query = (f'time > {int(starttime.timestamp() * 1000000000)}'
-                        f' AND time < {int(endtime.timestamp() * 1000000000)}'
-                        f' AND "{self.config.NODE_NAME}" =~ /{"|".join(sorted(node_names))}/')
-        interval = (self.config.HISTORIC_SHORT_INTERVAL if short_interval else self.config.HISTORIC_LONG_INTERVAL)
-        new_args = tuple([
-            args[0],
-            args[1],
-            filter_query,
-            args[3].replace('GROUP BY',
-                f'GROUP BY time({interval}s),'),
-            args[4]])
-        return self._parse_states(node_names, self._historic_description_query.get(*new_args))
+        return self._historic('states', node_names, starttime, endtime, short_interval)
 
     def _parse_rates(self, node_names, query_data):
         """
@@ -321,37 +657,29 @@ class InfluxClient(DataSource):
         :param query_data: 
 
         """
+        intern = sys.intern
+        ds = self.datasource
+        parse_ts = _parse_time
         rates = {}
         for node_name in node_names:
-            rates[node_name] = {}
+            node_rates = rates[node_name] = {}
             for result in query_data.get(node_name, []):
-                try:
-                    points = result[1]
-                    if isinstance(points, dict):
-                        # only one item returned without a timestamp, store a single datapoint
-                        if points.get('bw') is None:
-                            continue # no data found
-                        rates[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)] = Rate(
-                            points.get('in', 0) * 1000,
-                            points.get('out', 0) * 1000,
-                            points.get('bw') * 1000,
-                            self.datasource,
-                            datetime.now())
-                    else:
-                        # multiple items returned, store a list of datapoints
-                        rates[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)] = []
-                        for point in points:
-                            if point.get('bw') is None:
-                                # no data found, but keep empty spot so we don't shuffle times
-                                rates[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)].append(None)
-                            rates[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)].append(Rate(
-                                point.get('in', 0) * 1000,
-                                point.get('out', 0) * 1000,
-                                point.get('bw') * 1000,
-                                self.datasource,
-                                datetime.strptime(point.get('time'), "%Y-%m-%dT%H:%M:%S%z")))
-                except TypeError:
-                    continue # problem getting metrics (None was returned instead of an int), skip
+                points = result[1]
+                iface = intern(result[0][1])
+                if isinstance(points, dict):
+                    # only one item returned without a timestamp, store a single datapoint
+                    in_r, out_r, bw = points.get('in'), points.get('out'), points.get('bw')
+                    if in_r is None or out_r is None or bw is None:
+                        continue # no data found
+                    node_rates[iface] = Rate(in_r * 1000, out_r * 1000, bw * 1000, ds, datetime.now())
+                else:
+                    # multiple items returned, store a list of datapoints built in a single pass
+                    # if no data is found, keep an empty spot so we don't shuffle times
+                    node_rates[iface] = [
+                        Rate(point['in'] * 1000, point['out'] * 1000, point['bw'] * 1000, ds, parse_ts(point['time']))
+                        if (point.get('in') is not None and point.get('out') is not None
+                            and point.get('bw') is not None) else None
+                        for point in points]
         return rates
 
     @lookup_node
@@ -363,7 +691,7 @@ class InfluxClient(DataSource):
         name, inner dictionary is keyed by interface ID.
 
         """
-        return self._parse_rates(node_names, self._rate_query.get())
+        return self._select(self._rate_query.get()['rates'], node_names)
     
     @lookup_node
     def get_historic_rates(self, node_names, starttime=None, endtime=None, short_interval=False) -> dict:
@@ -379,24 +707,7 @@ class InfluxClient(DataSource):
         timestamp.
 
         """
-        if not isinstance(starttime, datetime) or not isinstance(endtime, datetime):
-            raise ValueError("starttime and endtime must be datetime objects")
-        # get existing args, modify for intervals and previous data
-        args = list(self._historic_rate_query.args)
-        # multiply time to get nanosecond precision
-        # also filter for specific sources - less likely to hit cache, but query time is faster
-        filter_query = (f'time > {int(starttime.timestamp() * 1000000000)}'
-                        f' AND time < {int(endtime.timestamp() * 1000000000)}'
-                        f' AND "{self.config.NODE_NAME}" =~ /{"|".join(sorted(node_names))}/')
-        interval = (self.config.HISTORIC_SHORT_INTERVAL if short_interval else self.config.HISTORIC_LONG_INTERVAL)
-        new_args = tuple([
-            args[0],
-            args[1],
-            filter_query,
-            args[3].replace('GROUP BY',
-                f'GROUP BY time({interval}s),'),
-            args[4]])
-        return self._parse_rates(node_names, self._historic_rate_query.get(*new_args))
+        return self._historic('rates', node_names, starttime, endtime, short_interval)
 
     def _parse_optics(self, node_names, query_data):
         """
@@ -405,58 +716,38 @@ class InfluxClient(DataSource):
         :param query_data: 
 
         """
+        intern = sys.intern
+        ds = self.datasource
+        parse_ts = _parse_time
         optics = {}
         for node_name in node_names:
-            optics[node_name] = {}
+            node_optics = optics[node_name] = {}
             for result in query_data.get(node_name, []):
-                try:
-                    points = result[1]
-                    # note: rename the interface names so they can be searched by the "real" interface
-                    name = result[0][1].get("name").split("Optics")[-1]
-                    
-                    if isinstance(points, dict):
-                        if points.get('lbc') is None:
-                            continue # no data found
-                        # only one item returned without a timestamp, store a single datapoint
-                        optics[node_name][name] = Optic(
-                            points.get('rx') / 100,
-                            points.get('tx') / 100,
-                            points.get('lbc') / 100,
-                            self.datasource,
-                            datetime.now())
-                        if optics[node_name][name].lbc > 100:
-                            # current bug with IOS-XR and 100G links - metrics are 10x bigger than they should be
-                            optics[node_name][name] = Optic(
-                                optics[node_name][name].rx / 10,
-                                optics[node_name][name].tx / 10,
-                                optics[node_name][name].lbc / 10,
-                                optics[node_name][name].datasource,
-                                optics[node_name][name].datetime)
-                    else:
-                        # multiple items returned, store a list of datapoints
-                        optics[node_name][name] = []
-                        for point in points:
-                            if point.get('lbc') is None:
-                                # no data found, but keep empty spot so we don't shuffle times
-                                optics[node_name][name].append(None)
-                                continue
-                            optic = Optic(
-                                point.get('rx') / 100,
-                                point.get('tx') / 100,
-                                point.get('lbc') / 100,
-                                self.datasource,
-                                datetime.strptime(point.get('time'), "%Y-%m-%dT%H:%M:%S%z"))
-                            if optic.lbc > 100:
-                                # current bug with IOS-XR and 100G links - metrics are 10x bigger than they should be
-                                optic = Optic(
-                                    optic.rx / 10,
-                                    optic.tx / 10,
-                                    optic.lbc / 10,
-                                    optic.datasource,
-                                    optic.datetime)
-                            optics[node_name][name].append(optic)
-                except TypeError:
-                    continue # problem getting metrics
+                points = result[1]
+                # note: rename the interface names so they can be searched by the "real" interface
+                name = intern(result[0][2].split("Optics")[-1])
+
+                if isinstance(points, dict):
+                    rx, tx, lbc = points.get('rx'), points.get('tx'), points.get('lbc')
+                    if rx is None or tx is None or lbc is None:
+                        continue # no data found
+                    # current bug with IOS-XR and 100G links - metrics are 10x bigger than they should be
+                    scale = (1000 if lbc > 10000 else 100)
+                    # only one item returned without a timestamp, store a single datapoint
+                    node_optics[name] = Optic(rx / scale, tx / scale, lbc / scale, ds, datetime.now())
+                else:
+                    # multiple items returned, store a list of datapoints
+                    iface_optics = node_optics[name] = []
+                    for point in points:
+                        rx, tx, lbc = point.get('rx'), point.get('tx'), point.get('lbc')
+                        if rx is None or tx is None or lbc is None:
+                            # no data found, but keep empty spot so we don't shuffle times
+                            iface_optics.append(None)
+                            continue
+                        # current bug with IOS-XR and 100G links - metrics are 10x bigger than they should be
+                        scale = (1000 if lbc > 10000 else 100)
+                        iface_optics.append(
+                            Optic(rx / scale, tx / scale, lbc / scale, ds, parse_ts(point.get('time'))))
         return optics
 
     @lookup_node
@@ -468,7 +759,7 @@ class InfluxClient(DataSource):
         name, inner dictionary is keyed by interface ID.
 
         """
-        return self._parse_optics(node_names, self._optic_query.get())
+        return self._select(self._optic_query.get()['optics'], node_names)
 
     @lookup_node
     def get_historic_optics(self, node_names, starttime=None, endtime=None, short_interval=False) -> dict:
@@ -484,24 +775,7 @@ class InfluxClient(DataSource):
         timestamp.
 
         """
-        if not isinstance(starttime, datetime) or not isinstance(endtime, datetime):
-            raise ValueError("starttime and endtime must be datetime objects")
-        # get existing args, modify for intervals and previous data
-        args = list(self._historic_optic_query.args)
-        # multiply time to get nanosecond precision
-        # also filter for specific sources - less likely to hit cache, but query time is faster
-        filter_query = (f'time > {int(starttime.timestamp() * 1000000000)}'
-                        f' AND time < {int(endtime.timestamp() * 1000000000)}'
-                        f' AND "{self.config.NODE_NAME}" =~ /{"|".join(sorted(node_names))}/')
-        interval = (self.config.HISTORIC_SHORT_INTERVAL if short_interval else self.config.HISTORIC_LONG_INTERVAL)
-        new_args = tuple([
-            args[0],
-            args[1],
-            filter_query,
-            args[3].replace('GROUP BY',
-                f'GROUP BY time({interval}s),'),
-            args[4]])
-        return self._parse_optics(node_names, self._historic_optic_query.get(*new_args))
+        return self._historic('optics', node_names, starttime, endtime, short_interval)
 
     def _parse_counters(self, node_names, query_data):
         """
@@ -509,39 +783,35 @@ class InfluxClient(DataSource):
         :param query_data:
         :param query_data: 
         """
+        intern = sys.intern
+        ds = self.datasource
+        parse_ts = _parse_time
         counters = {}
         for node_name in node_names:
-            counters[node_name] = {}
+            node_counters = counters[node_name] = {}
             for result in query_data.get(node_name, []):
-                try:
-                    points = result[1]
-                    if isinstance(points, dict):
-                        # only one item returned without a timestamp, store a single datapoint
-                        if points.get('crc') is None:
-                            continue # no data found
-                        counters[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)] = Counter(
-                            max(points.get('crc', 0), 0),
-                            max(points.get('inerr', 0), 0),
-                            max(points.get('inrx', 0), 0),
-                            max(points.get('outerr', 0), 0),
-                            self.datasource,
-                            datetime.now())
-                    else:
-                        # multiple items returned, store a list of datapoints
-                        counters[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)] = []
-                        for point in points:
-                            if point.get('crc') is None:
-                                # no data found, but keep empty spot so we don't shuffle times
-                                counters[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)].append(None)
-                            counters[node_name][result[0][1].get(self.config.METRIC_INTERFACE_NAME)].append(Counter(
-                                max(point.get('crc', 0), 0),
-                                max(point.get('inerr', 0), 0),
-                                max(point.get('inrx', 0), 0),
-                                max(point.get('outerr', 0), 0),
-                                self.datasource,
-                                datetime.strptime(point.get('time'), "%Y-%m-%dT%H:%M:%S%z")))
-                except TypeError:
-                    continue # problem getting counters (None was returned instead of an int), skip
+                points = result[1]
+                iface = intern(result[0][1])
+                if isinstance(points, dict):
+                    # only one item returned without a timestamp, store a single datapoint
+                    crc, inerr = points.get('crc'), points.get('inerr')
+                    inrx, outerr = points.get('inrx'), points.get('outerr')
+                    if crc is None or inerr is None or inrx is None or outerr is None:
+                        continue # no data found
+                    node_counters[iface] = Counter(
+                        max(crc, 0), max(inerr, 0), max(inrx, 0), max(outerr, 0), ds, datetime.now())
+                else:
+                    # multiple items returned, store a list of datapoints
+                    iface_counters = node_counters[iface] = []
+                    for point in points:
+                        crc, inerr = point.get('crc'), point.get('inerr')
+                        inrx, outerr = point.get('inrx'), point.get('outerr')
+                        if crc is None or inerr is None or inrx is None or outerr is None:
+                            # no data found, but keep empty spot so we don't shuffle times
+                            iface_counters.append(None)
+                            continue
+                        iface_counters.append(Counter(
+                            max(crc, 0), max(inerr, 0), max(inrx, 0), max(outerr, 0), ds, parse_ts(point.get('time'))))
         return counters
 
     @lookup_node
@@ -553,7 +823,7 @@ class InfluxClient(DataSource):
         name, inner dictionary is keyed by interface ID.
 
         """
-        return self._parse_counters(node_names, self._counter_query.get())
+        return self._select(self._counter_query.get()['counters'], node_names)
 
     @lookup_node
     def get_historic_counters(self, node_names, starttime=None, endtime=None, short_interval=False) -> dict:
@@ -569,22 +839,107 @@ class InfluxClient(DataSource):
         timestamp.
 
         """
-        if not isinstance(starttime, datetime) or not isinstance(endtime, datetime):
-            raise ValueError("starttime and endtime must be datetime objects")
-        # get existing args, modify for intervals and previous data
-        args = list(self._historic_counter_query.args)
-        # multiply time to get nanosecond precision
-        # also filter for specific sources - less likely to hit cache, but query time is faster
-        filter_query = (f'time > {int(starttime.timestamp() * 1000000000)}'
-                        f' AND time < {int(endtime.timestamp() * 1000000000)}'
-                        f' AND "{self.config.NODE_NAME}" =~ /{"|".join(sorted(node_names))}/')
-        interval = (self.config.HISTORIC_SHORT_INTERVAL if short_interval else self.config.HISTORIC_LONG_INTERVAL)
-        new_args = tuple([
-            args[0],
-            args[1],
-            filter_query,
-            args[3].replace('GROUP BY',
-                f'GROUP BY time({interval}s),'),
-            args[4]])
-        print(new_args)
-        return self._parse_counters(node_names, self._historic_counter_query.get(*new_args))
+        return self._historic('counters', node_names, starttime, endtime, short_interval)
+
+
+class InfluxClient3(InfluxClient):
+    """InfluxDB 3 Data source.
+
+    Live queries still go through the InfluxDB 1.x compatible HTTP API, but historic queries are sent over Arrow
+    Flight, which returns columnar record batches instead of large JSON payloads. This requires the
+    influxdb3-python and pyarrow packages, and is enabled by setting INFLUX_FLIGHT_HOST.
+
+
+    """
+    def connect(self, config):
+        """Connect to the InfluxDB database(s), and create Flight clients for historic queries.
+
+        :param config: Configuration to pass to setup/connection.
+
+        """
+        if InfluxDBClient3 is None:
+            raise ImportError("InfluxDB 3 support requires the influxdb3-python and pyarrow packages")
+        super().connect(config)
+        flight_host = config.get('INFLUX_FLIGHT_HOST')
+        flight_token = config.get('INFLUX_FLIGHT_TOKEN')
+        if not flight_host:
+            raise ValueError("Missing environment/config variable INFLUX_FLIGHT_HOST")
+        # one Flight client per database, keyed by the 1.x connection so cache args can be reused as-is
+        clients = {}
+        self._flight = {}
+        for connection, (_, _, database) in self._databases.items():
+            if database not in clients:
+                clients[database] = InfluxDBClient3(host=flight_host, token=flight_token, database=database)
+            self._flight[connection] = clients[database]
+
+    def _query_by_device_multi(self, connection, query, query_time, query_group, query_limit):
+        """Same as InfluxClient._query_by_device_multi, except the query is sent over Arrow Flight.
+
+        :param connection: an InfluxDBClient object, used to look up the matching Flight client.
+        :param query: SELECT portion of the query to pass through as a string.
+        :param query_time: Time portion of the query (WHERE TIME > ...) to pass through as a string.
+        :param query_group: Group portion of the query (GROUP BY ...) to pass through as a string.
+        :param query_limit: Limit portion of the query (LIMIT ...) to pass through as a string.
+
+        """
+        table = self._flight[connection].query(
+            query + f' {query_time} {query_group} {query_limit}', language='influxql', mode='all')
+        return self._split_table(table, query_group)
+
+    def _split_table(self, table, query_group):
+        """Split an Arrow table into a dictionary keyed by node name, in the same format as _split_by_device_multi,
+        so the existing parsers can be used unchanged.
+
+        :param table: pyarrow Table returned from InfluxDBClient3.query.
+        :param query_group: Group portion of the query, used to tell tag columns apart from field columns.
+
+        """
+        columns = table.column_names
+        tag_names = [column for column in columns if f'"{column}"' in query_group]
+        field_names = [column for column in columns if column not in tag_names and column not in _ARROW_SKIP]
+        table = table.sort_by([(column, 'ascending') for column in tag_names] + [('time', 'ascending')])
+        # whole-second timestamps in the same RFC3339 format the 1.x API returns, converted in one pass
+        time_column = table.column('time')
+        times = pc.strftime(pc.cast(time_column, pa.timestamp('s', tz=time_column.type.tz), safe=False),
+                            format='%Y-%m-%dT%H:%M:%SZ').to_pylist()
+        # columns are converted in bulk, then zipped back together into rows
+        tag_rows = zip(*(table.column(column).to_pylist() for column in tag_names))
+        field_rows = zip(*(table.column(column).to_pylist() for column in field_names))
+        series = {}
+        for tag_values, timestamp, field_values in zip(tag_rows, times, field_rows):
+            point = dict(zip(field_names, field_values))
+            point['time'] = timestamp
+            series.setdefault(tag_values, []).append(point)
+
+        tag_keys = self._tag_keys
+        noderesult = defaultdict(list)
+        for tag_values, points in series.items():
+            if None in tag_values:
+                continue # null device or interface tag, these rows can't be matched to an interface
+            tags = tuple(map(dict(zip(tag_names, tag_values)).get, tag_keys))
+            noderesult[sys.intern(tags[0])].append((tags, points))
+        return noderesult
+
+    @lookup_node
+    def prefetch_historic(self, node_names, starttime=None, endtime=None, short_interval=False, kinds=()) -> dict:
+        """Fill historic caches for the same nodes and time range in parallel. Flight requests only take a single
+        statement, so queries are run concurrently instead of being batched together.
+
+        :param node_names: List of node names to query.
+        :param starttime: Beginning time as a datetime object. (Default value = None)
+        :param endtime: End time as a datetime object. (Default value = None)
+        :param short_interval: If True, use short intervals, otherwise use long intervals as defined in the config.
+        (Default value = False)
+        :param kinds: Historic data to fetch, any of "states", "rates", "optics" or "counters". (Default value = ())
+        :returns: An empty dictionary, so this can be run with Circuit.merge_datasources().
+
+        """
+        if not node_names:
+            return {} # nothing to fetch, and an empty node filter isn't valid InfluxQL
+        futures = []
+        for kind in kinds:
+            cache, group, _ = self._historic_queries[kind]
+            args = self._historic_args(cache, group, node_names, starttime, endtime, short_interval)
+            futures.append(self._executor.submit(cache.get, *args))
+        wait(futures)
+        return {}
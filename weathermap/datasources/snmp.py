@@ -1,17 +1,49 @@
 import asyncio
 import logging
+import re
 import sys
 import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from easysnmp import Session
 from easysnmp.exceptions import EasySNMPTimeoutError
 from os import path
-
-# update syspath to enable relative imports
-sys.path.append(path.dirname(path.dirname(path.realpath(__file__))))
+from typing import List, NamedTuple, Optional
+
+# update syspath to enable relative imports. datasource is imported as a top-level module everywhere (circuit.py,
+# link.py, tests), so it has to be imported the same way here or Rate/State/etc. would be different classes. only add
+# the path once, even if this module is reloaded
+_WEATHERMAP_PATH = path.dirname(path.dirname(path.realpath(__file__)))
+if _WEATHERMAP_PATH not in sys.path:
+    sys.path.append(_WEATHERMAP_PATH)
 from datasource import Cache, DataSource, Node, Rate, Optic, Counter, State, lookup_node
 
+SESSION_IDLE_TIMEOUT = 3600  # seconds before an unused session is recreated
+RETRY_BACKOFF_MAX = 3600  # maximum seconds between setup retries for a failed host
+class _KeepDigits(dict):
+    """str.translate() table that deletes everything except digits and slashes from interface names. Entries are
+    added on first use, so any character (not just ASCII) is handled without building a table for all of Unicode."""
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        keep = self[codepoint] = (codepoint if char.isdigit() or char == '/' else None)
+        return keep
+
+_KEEP_TABLE = _KeepDigits()
+# easysnmp value types for OIDs that don't exist (anymore) on a device
+_MISSING_TYPES = frozenset({'NOSUCHINSTANCE', 'NOSUCHOBJECT'})
+# ifOperStatus values, anything else (testing, dormant, etc.) is reported as unknown
+_LINK_STATES = {'1': 'up', '2': 'down'}
+
+class HostCounters(NamedTuple):
+    """Keep track of the last counter reading for a host. Each host gets its own reading, which is only replaced by
+    that host's poll, so hosts polled in parallel never write to the same object."""
+    indexes: List[str]
+    in_bytes: List[Optional[int]]
+    out_bytes: List[Optional[int]]
+    timestamp: float # time.monotonic() when the counters were read
+
 class SNMPClient(DataSource):
     """SNMPv2 Data source.
     
@@ -181,24 +213,47 @@ class SNMPPoller(object):
     def __init__(self, config):
         # keep dictionaries of hostnames, sessions, and interface IDs
         self.sessions = {}
+        # community strings and last use (monotonic) times by host address, so sessions can be recreated
+        self._communities = {}
+        self._last_used = {}
+        # host addresses keyed by both address and device name, for set up hosts only
+        self._resolved = {}
         self.hostnames = {}
         self.interface_oids = {}
         self.optic_interface_oids = {}
-        # keep track of in and out bytes so we can calculate rates
-        self.prev_in_bytes = {}
-        self.prev_out_bytes = {}
+        # sets of names already in interface_oids/optic_interface_oids for each node, to skip duplicates
+        self._interface_names = {}
+        self._optic_interface_names = {}
+        # nodes that already had their list of OIDs to poll built, so later rebuilds walk the interface table again
+        self._interface_oids_built = set()
+        # keep track of in and out bytes so we can calculate rates, HostCounters keyed by node name
+        self._prev_counters = {}
         # list of failed host to try later
         self.failed_hosts = set()
+        # next retry time (monotonic) and number of consecutive failures, keyed by failed host
+        self._backoff = {}
+        # hosts are polled in parallel, each host only uses its own session
+        self._executor = ThreadPoolExecutor(max_workers=16)
 
         # read configuration
         self.config = config
-        hostlist = config.get('SNMP_HOSTS', '').split(',')
+        # skip empty entries, so an unset SNMP_HOSTS or a trailing comma doesn't give an empty hostname
+        hostlist = [host.strip() for host in config.get('SNMP_HOSTS', '').split(',') if host.strip()]
         # default SNMP interval is 30 seconds
         self.interval = int(config.get('SNMP_INTERVAL', 30))
+        # number of rows returned for each OID in a GETBULK request
+        self.max_repetitions = int(config.get('SNMP_MAX_REPETITIONS', 125))
+        # number of OIDs in each GET request, so responses stay under the device's maximum packet size
+        self.get_batch_size = int(config.get('SNMP_GET_BATCH_SIZE', 24))
+        # how often the list of OIDs to poll for each device is rebuilt, in seconds (default is 1 hour)
+        oid_refresh = int(config.get('SNMP_OID_REFRESH', 3600))
         if not hostlist:
             raise ValueError("Missing environment/config variable SNMP_HOSTS")
         if not config.get('SNMP_COMMUNITY'):
             raise ValueError("Missing environment/config variable SNMP_COMMUNITY")
+        # matches optic sensor names we care about
+        self._sensor_re = re.compile('|'.join(re.escape(sensor) for sensor in (
+            config.OPTIC_RX_SENSOR_NAME, config.OPTIC_TX_SENSOR_NAME, config.OPTIC_LBC_SENSOR_NAME)))
 
         # generate EasySNMP sessions for each host
         for host in hostlist:
@@ -209,18 +264,17 @@ class SNMPPoller(object):
 
         # set cache objects so we don't have to check routers constantly
         self._description_cache = Cache('descriptions', self._query_multiple, None, timeout=timedelta(hours=8))
-        # keep bandwidth cache separate, since it doesn't need to be updated that often
-        self._bw_cache = Cache('bw', self._get_bandwidths, None, timeout=timedelta(hours=8))
-        # we also need caches for rates - because they return zero if run before the byte cache expires
-        self._rate_cache = Cache('rates', self._retrieve_rates, None, timeout=timedelta(seconds=self.interval))
-        # cache for optics
+        # OIDs to GET for rates and states, built from the interface table so polls don't walk every table again
+        self._interface_oid_cache = Cache('interface-oids', self._get_interface_oids, None,
+                                          timeout=timedelta(seconds=oid_refresh))
+        # rates, states and optics for every device, refreshed together once per polling interval by run(). requests
+        # only read the latest results (see _polled), so devices are never polled outside of the polling loop
+        self._poll_cache = Cache('poll', self._poll_hosts, timeout=timedelta(seconds=self.interval * 2))
+        # cache for optic interface names
         self._optic_int_cache = Cache('optics-int', self._query_bulk, None, timeout=timedelta(hours=8))
-        self._optic_stat_cache = Cache('optics-stat', self._retrieve_optics, None, timeout=timedelta(seconds=self.interval))
-        self._state_cache = Cache('state', self._get_link_states, None, timeout=timedelta(seconds=self.interval))
 
-        # start SNMP polling thread
-        t = threading.Thread(target=self.setup_loop)
-        t.start()
+        # start SNMP polling
+        self.start()
 
     def _setup_host(self, host, community):
         """Configure an SNMP host for polling.
@@ -228,11 +282,9 @@ class SNMPPoller(object):
         :param host: Remote device hostname or IP address.
         :param community: SNMPv2 community string for access.
         """
-        try:
-            self.sessions[host] = Session(hostname=host, community=community, version=2)
-        except Exception as e:
-            logging.error(f"Problem adding SNMP device {host}: {e}")
-            self.failed_hosts.add((host, community))
+        # the session itself is created on first use
+        self._communities[host] = community
+        self._resolved[host] = host
 
         # also generate the hostname dictionary so we can do name->IP lookups
         try:
@@ -240,65 +292,149 @@ class SNMPPoller(object):
         except Exception as e:
             logging.error(f"Problem accessing SNMP device {host} (probably incorrect community): {e}")
             self.failed_hosts.add((host, community))
-            del self.sessions[host] # remove bad device
-
-    def setup_loop(self):
-        """Configure and start the event loop for SNMP polling.
+            # remove bad device
+            self.sessions.pop(host, None)
+            del self._communities[host]
+            del self._resolved[host]
+            # wait longer between each retry, starting at 10 intervals
+            failures = self._backoff.get(host, (0, 0))[1] + 1
+            delay = min(self.interval * 10 * 2 ** (failures - 1), RETRY_BACKOFF_MAX)
+            self._backoff[host] = (time.monotonic() + delay, failures)
+        else:
+            self._backoff.pop(host, None)
+
+    def _get_session(self, host):
+        """Get the SNMP session for a device. Sessions are kept between polls, but are recreated if they were
+        dropped after an error or haven't been used for a while.
+
+        :param host: SNMP device, can be hostname or device name.
+        :returns: A tuple of (host address, easysnmp Session).
         """
-        asyncio.set_event_loop(asyncio.SelectorEventLoop())
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self.main_loop())
-
-    async def main_loop(self):
-        """SNMP polling loop. Poll devices based on the interval set with SNMP_INTERVAL in the config, but stop polling
-        a particular device if it fails more than 10 times.
+        address = self._resolved.get(host) # convert to address first
+        if address is None:
+            raise ValueError(f"Unknown host {host}")
+        host = address
+        now = time.monotonic()
+        session = self.sessions.get(host)
+        if session is None or now - self._last_used.get(host, now) > SESSION_IDLE_TIMEOUT:
+            session = self.sessions[host] = Session(hostname=host, community=self._communities[host], version=2)
+        self._last_used[host] = now
+        return host, session
+
+    def _session_call(self, host, method, *args, **kwargs):
+        """Run an easysnmp Session method for a device. If the request fails, the session is dropped so a fresh one
+        is used for the next request.
+
+        :param host: SNMP device, can be hostname or device name.
+        :param method: Session method name as a string, like "get" or "bulkwalk".
+        :returns: The Session method's return value.
         """
-        failed_counter = 0
+        host, session = self._get_session(host)
+        try:
+            return getattr(session, method)(*args, **kwargs)
+        except (EasySNMPTimeoutError, SystemError):
+            self.sessions.pop(host, None)
+            raise
+
+    def start(self):
+        """Start SNMP polling. If there is already an event loop running (an async app), polling is scheduled on it,
+        otherwise it runs in a background thread with its own event loop.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True).start()
+        else:
+            self._task = loop.create_task(self.run())
+
+    async def run(self):
+        """SNMP polling loop. Poll devices based on the interval set with SNMP_INTERVAL in the config. Devices that
+        failed setup are retried with an increasing delay between attempts.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
         while True:
-            current_time = datetime.now()
-            # if we still have failed devices during setup, try again (but not every interval)
-            if self.failed_hosts and failed_counter >= 10:
-                failed_counter = 0
-                for failed_host, community in self.failed_hosts:
-                    try:
-                        logging.info(f"Attempting setup retry on SNMP host {failed_host}")
-                        self._setup_host(failed_host, community)
-                        # at this point setup was successful, remove from failed host list
-                        self.failed_hosts.remove((failed_host, community))
-                    except:
-                        logging.warn(f"Failed to setup SNMP host {failed_host} on retry")
-                        # still broken, keep going
-                        continue
-
-            # check/update caches for each device
-            for host in self.hostnames:
-                try:
-                    self.get_descriptions(host)
-                    self.get_rates(host)
-                    self.get_optics(host)
-                except EasySNMPTimeoutError:
-                    logging.warn(f"SNMP timeout connecting to {host}")
-                except SystemError as e:
-                    # internal EasySNMP bug
-                    if "returned NULL" in str(e):
-                        logging.warn(f"SNMP connection problem querying {host}")
-                    else:
-                        raise e
-
-            # sleep the rest of the time so we can run about once per interval
-            remaining = (self.interval - 1) - (datetime.now() - current_time).total_seconds()
-            await asyncio.sleep(remaining)
+            # if we still have failed devices during setup, try again once their backoff has passed
+            now = time.monotonic()
+            retries = {} # futures keyed by (host, community)
+            for failed_host, community in list(self.failed_hosts):
+                if now >= self._backoff.get(failed_host, (0, 0))[0]:
+                    # retry in the thread pool while polling, so working hosts aren't held up
+                    self.failed_hosts.discard((failed_host, community))
+                    retries[failed_host, community] = loop.run_in_executor(
+                        self._executor, self._retry_host, failed_host, community)
+
+            # poll all devices at once and replace the cached results in one go
+            self._poll_cache.set(await loop.run_in_executor(None, self._poll_hosts))
+            # finish retries before the next poll, so they never overlap with it
+            results = await asyncio.gather(*retries.values(), return_exceptions=True)
+            for (failed_host, community), result in zip(retries, results):
+                if isinstance(result, Exception):
+                    logging.error(f"Problem retrying setup on SNMP host {failed_host}: {result}")
+                    self.failed_hosts.add((failed_host, community)) # try again later
+
+            # sleep until the next interval, based on when polling started so slow polls don't shift the schedule
+            deadline += self.interval
+            if loop.time() > deadline:
+                # polling took longer than an interval, skip the missed polls instead of running them back to back
+                logging.warn(f"SNMP polling took longer than {self.interval} seconds, skipping missed intervals")
+                deadline += (loop.time() - deadline) // self.interval * self.interval + self.interval
+            await asyncio.sleep(max(0, deadline - loop.time()))
     
+    def _retry_host(self, host, community):
+        """Retry setup for a host that failed before. On failure, the host is added back to self.failed_hosts.
+
+        :param host: Remote device hostname or IP address.
+        :param community: SNMPv2 community string for access.
+        """
+        logging.info(f"Attempting setup retry on SNMP host {host}")
+        self._setup_host(host, community)
+        if (host, community) in self.failed_hosts:
+            logging.warn(f"Failed to setup SNMP host {host} on retry")
+
+    def _poll_hosts(self):
+        """Poll rates, states and optics from all devices in parallel, so one slow device doesn't hold up the rest.
+
+        :returns: A dictionary with 'rates', 'states' and 'optics' dictionaries, each keyed by node name.
+        """
+        hosts = list(self.hostnames)
+        polled = {'rates': {}, 'states': {}, 'optics': {}}
+        for host, (rates, states, optics) in zip(hosts, self._executor.map(self._poll_host, hosts)):
+            polled['rates'][host] = rates
+            polled['states'][host] = states
+            polled['optics'][host] = optics
+        return polled
+
+    def _poll_host(self, host):
+        """Refresh descriptions and read rates, states and optics for a single device. This runs in the thread pool.
+
+        :param host: Device name as a string.
+        :returns: A tuple of (rates, states, optics) dictionaries, all empty if the device couldn't be polled.
+        """
+        try:
+            self.get_descriptions(host)
+            return (*self._retrieve_interfaces(host), self._retrieve_optics(host))
+        except EasySNMPTimeoutError:
+            logging.warn(f"SNMP timeout connecting to {host}")
+        except SystemError as e:
+            # internal EasySNMP bug
+            if "returned NULL" in str(e):
+                logging.warn(f"SNMP connection problem querying {host}")
+            else:
+                logging.error(f"Problem polling SNMP host {host}: {e}")
+        except Exception as e:
+            logging.error(f"Problem polling SNMP host {host}: {e}")
+        return {}, {}, {}
+
     def _set_device_name(self, host):
         """Set the reachable hostname for a particular device.
 
         :param host: Hostname/IP address as a string.
         """
-        if host not in self.sessions:
-            raise ValueError(f"Unknown host {host}")
-        result = self.sessions[host].get(self.config.NODE_OID)
+        result = self._session_call(host, 'get', self.config.NODE_OID)
         hostname = result.value.split('.')[0] # remove domain name
         self.hostnames[hostname] = host
+        self._resolved[hostname] = host
 
     def get_device_names(self):
         """Get a dictionary of hosts.
@@ -320,11 +456,7 @@ class SNMPPoller(object):
 
         :returns: A specific value for that particular OID.
         """
-        if host in self.hostnames:
-            host = self.hostnames[host] # convert to address first
-        if host not in self.sessions:
-            raise ValueError(f"Unknown host {host}")
-        return self.sessions[host].get(oid).value
+        return self._session_call(host, 'get', oid).value
 
     def _query_multiple(self, host, oid):
         """Run an SNMP query for a single OID that may return many values.
@@ -337,17 +469,30 @@ class SNMPPoller(object):
 
         """
         # getbulk() can have some performance issues, so use this unless not enough items are returned
-        if host in self.hostnames:
-            host = self.hostnames[host] # convert to address first
-        if host not in self.sessions:
-            raise ValueError(f"Unknown host {host}")
+        # the first OID component may be returned as "iso" instead of "1", so only compare the rest
+        prefix = oid[2:]
         results = {}
-        for result in self.sessions[host].get_bulk(oid, max_repetitions=125):
-            if oid[2:] not in result.oid:
+        for result in self._session_call(host, 'get_bulk', oid, max_repetitions=self.max_repetitions):
+            base, _, index = result.oid.rpartition('.')
+            if not base.endswith(prefix):
                 continue # different oid somehow got pulled, ignore
-            results[result.oid.split('.')[-1]] = result.value
+            results[index] = result.value
         return results
     
+    def _query_oids(self, host, oids):
+        """Run SNMP GETs for a list of exact OIDs, in batches of self.get_batch_size OIDs per request. A single request
+        for every OID could be larger than the device's maximum packet size (tooBig).
+
+        :param host: SNMP device to query, can be hostname or device name.
+        :param oids: List of SNMP OIDs (including the index) as strings.
+        :returns: A list of values in the same order as oids, with None for OIDs that don't exist on the device.
+
+        """
+        size = self.get_batch_size
+        return [(None if result.snmp_type in _MISSING_TYPES else result.value)
+                for start in range(0, len(oids), size)
+                for result in self._session_call(host, 'get', oids[start:start + size])]
+
     def _query_bulk(self, host, oid):
         """Run an SNMP query for a single OID that may return many values.
 
@@ -356,15 +501,13 @@ class SNMPPoller(object):
         :returns: A dictionary of results keyed by device name.
 
         """
-        if host in self.hostnames:
-            host = self.hostnames[host] # convert to address first
-        if host not in self.sessions:
-            raise ValueError(f"Unknown host {host}")
+        prefix = oid[2:]
         results = {}
-        for result in self.sessions[host].bulkwalk(oid):
-            if oid[2:] not in result.oid:
+        for result in self._session_call(host, 'bulkwalk', oid):
+            base, _, index = result.oid.rpartition('.')
+            if not base.endswith(prefix):
                 continue # different oid somehow got pulled, ignore
-            results[result.oid.split('.')[-1]] = result.value
+            results[index] = result.value
         return results
 
     def _map_interfaces(self, node_name):
@@ -373,14 +516,18 @@ class SNMPPoller(object):
         :param node_name: Node name as a string.
 
         """
-        # generate a dictionary that maps OIDs to interface names
+        # generate a dictionary that maps OIDs to interface names. this is built from scratch and then replaced, so
+        # removed or reindexed interfaces don't stay around
         intnames = self._description_cache.get(node_name, self.config.INTERFACE_NAME_OID)
-        for int_oid in intnames:
-            if node_name not in self.interface_oids:
-                self.interface_oids[node_name] = {}
+        interface_oids = {}
+        interface_names = set()
+        for int_oid, int_name in intnames.items():
             # avoid duplicate entries on IOS-XE devices
-            if intnames[int_oid] not in self.interface_oids[node_name].values():
-                self.interface_oids[node_name][int_oid] = intnames[int_oid]
+            if int_name not in interface_names:
+                interface_oids[int_oid] = int_name
+                interface_names.add(int_name)
+        self.interface_oids[node_name] = interface_oids
+        self._interface_names[node_name] = interface_names
     
     def _map_optic_interfaces(self, node_name):
         """Match optics result OIDs to interface names. This gets updated into self.optic_interface_oids.
@@ -390,18 +537,15 @@ class SNMPPoller(object):
         """
         # generate a dictionary that maps OIDs to optical interface names
         opticnames = self._optic_int_cache.get(node_name, self.config.OPTIC_NAME_OID)
-        for int_oid in opticnames:
-            if node_name not in self.optic_interface_oids:
-                self.optic_interface_oids[node_name] = {}
+        optic_interface_oids = self.optic_interface_oids.setdefault(node_name, {})
+        optic_interface_names = self._optic_interface_names.setdefault(node_name, set())
+        for int_oid, int_name in opticnames.items():
             # avoid duplicate entries on IOS-XE devices
-            if opticnames[int_oid] not in self.optic_interface_oids[node_name].values():
-                int_name = opticnames[int_oid]
-                if not any(sensor in int_name for sensor in [
-                        self.config.OPTIC_RX_SENSOR_NAME,
-                        self.config.OPTIC_TX_SENSOR_NAME,
-                        self.config.OPTIC_LBC_SENSOR_NAME]):
+            if int_name not in optic_interface_names:
+                if not self._sensor_re.search(int_name):
                     continue # not a sensor we care about
-                self.optic_interface_oids[node_name][int_oid] = opticnames[int_oid]
+                optic_interface_oids[int_oid] = int_name
+                optic_interface_names.add(int_name)
 
     def get_descriptions(self, node_name):
         """Get a list of interface descriptions via SNMP for a particular node.
@@ -420,95 +564,99 @@ class SNMPPoller(object):
                 descriptions[self.interface_oids[node_name][descr_oid]] = descrs[descr_oid]
         return descriptions
 
-    def _compute_rates(self, node_name, prev_dict, reading):
-        """Calculate bitrates with a dictionary of previous values and a current counter reading.
+    def _compute_rates(self, previous, current, seconds):
+        """Calculate bitrates from two counter readings.
 
-        :param node_name: Node name as a string.
-        :param prev_dict: Previous counters as a dictionary.
-        :param reading: Current counters as a dictionary.
+        :param previous: Previous counters as a list of integers.
+        :param current: Current counters as a list, in the same order as previous.
+        :param seconds: Time between the readings in seconds.
+        :returns: A list of bitrates in the same order, with None where either reading is missing.
 
         """
-        if node_name not in self.interface_oids:
-            self._map_interfaces(node_name)
-
-        rates = {}
-        current_time = datetime.now()
-        for int_oid in reading:
-            if int_oid not in self.interface_oids[node_name]:
-                continue    # this interface can't be matched, give up
-            int_name = self.interface_oids[node_name][int_oid]
-            if node_name not in prev_dict:
-                prev_dict[node_name] = {}  # add an entry for this node
-            if int_name in prev_dict[node_name] and 'timestamp' in prev_dict[node_name]:
-                # calculate difference
-                time_delta = current_time - prev_dict[node_name]['timestamp']
-                byte_delta = int(reading[int_oid]) - int(prev_dict[node_name][int_name])
-                if time_delta.total_seconds() < 1:
-                    continue # something wrong with the timestamp, no way to calculate real rate
-                rates[int_name] = (byte_delta * 8 / time_delta.total_seconds())
-            # save the counter for next time
-            prev_dict[node_name][int_name] = int(reading[int_oid])
-
-        prev_dict[node_name]['timestamp'] = current_time
-        return rates
+        scale = 8 / seconds
+        return [(None if prev is None or cur is None else int((cur - prev) * scale))
+                for prev, cur in zip(previous, current)]
 
-    def _get_bandwidths(self, node_name):
-        """Get interface bandwidths for a particular node. 
+    def _get_interface_oids(self, node_name):
+        """Build the list of counter, bandwidth and link state OIDs to poll for a particular node. This runs again every
+        SNMP_OID_REFRESH seconds, which walks the interface name table again to pick up new or reindexed interfaces.
 
         :param node_name: Node name as a string.
-        :returns: A dictionary of bandwidths keyed by interface name.
+        :returns: A tuple of (OID indexes, OIDs), OIDs are grouped by input counter, output counter, bandwidth and link
+        state, each in the same order as the indexes.
 
         """
-        if node_name not in self.interface_oids:
+        if node_name in self._interface_oids_built:
+            # not the first build, so the interface names may be outdated
+            self._description_cache.update(node_name, self.config.INTERFACE_NAME_OID)
             self._map_interfaces(node_name)
+        elif node_name not in self.interface_oids:
+            self._map_interfaces(node_name)
+        self._interface_oids_built.add(node_name)
+        indexes = list(self.interface_oids[node_name])
+        oids = [f'{oid}.{index}'
+                for oid in (self.config.IN_RATE_OID, self.config.OUT_RATE_OID, self.config.BW_RATE_OID,
+                            self.config.LINK_STATE_OID)
+                for index in indexes]
+        return indexes, oids
 
-        bandwidths = self._query_multiple(node_name, self.config.BW_RATE_OID)
-        # match interface OIDs to names
-        new_bandwidths = {}
-        for int_oid in bandwidths:
-            if int_oid not in self.interface_oids[node_name]:
-                continue    # this interface can't be matched, give up
-            int_name = self.interface_oids[node_name][int_oid]
-            new_bandwidths[int_name] = int(bandwidths[int_oid]) * 1000 * 1000
-
-        return new_bandwidths
-
-    def _retrieve_rates(self, node_name):
-        """Compute interface bitrates and bandwidths from SNMP for a particular node.
+    def _retrieve_interfaces(self, node_name):
+        """Compute interface bitrates and bandwidths, and get link states from SNMP for a particular node.
 
         :param node_name: Node name as a string.
-        :returns: A dictionary of Rate objects keyed by interface names.
+        :returns: A tuple of (rates, states), dictionaries of Rate and State objects keyed by interface names.
 
         """
         try:
-            bandwidths = self._bw_cache.get(node_name) # bandwidths almost never change
-            in_bytes = self._query_multiple(node_name, self.config.IN_RATE_OID)
-            out_bytes = self._query_multiple(node_name, self.config.OUT_RATE_OID)
-            in_rates = self._compute_rates(node_name, self.prev_in_bytes, in_bytes)
-            out_rates = self._compute_rates(node_name, self.prev_out_bytes, out_bytes)
-
-            # this assumes all interfaces show up between in, out, and bandwidth (they do)
-            return {interface: Rate(
-                int(in_rates[interface]),
-                int(out_rates[interface]),
-                bandwidths[interface],
+            # get counters, bandwidths and states in one round trip, only for interfaces we know about
+            indexes, oids = self._interface_oid_cache.get(node_name)
+            values = self._query_oids(node_name, oids)
+            # monotonic time for rate math (not affected by clock changes), one datetime for all Rate/State objects
+            timestamp = time.monotonic()
+            current_time = datetime.now()
+            count = len(indexes)
+            # parse every counter and bandwidth once here, so previous readings are kept as integers
+            numbers = [None if value is None else int(value) for value in values[:count * 3]]
+            in_bytes, out_bytes, bandwidths = numbers[:count], numbers[count:count * 2], numbers[count * 2:]
+
+            names = self.interface_oids[node_name]
+            states = {names[index]: State(_LINK_STATES.get(state, 'unknown'), 'snmp', current_time)
+                      for index, state in zip(indexes, values[count * 3:])
+                      if state is not None}
+
+            previous = self._prev_counters.get(node_name)
+            self._prev_counters[node_name] = HostCounters(indexes, in_bytes, out_bytes, timestamp)
+            if previous is None or previous.indexes != indexes:
+                return {}, states # first reading for these interfaces, rates can be calculated next time
+            seconds = timestamp - previous.timestamp
+            if seconds < 1:
+                return {}, states # something wrong with the timestamp, no way to calculate real rate
+            in_rates = self._compute_rates(previous.in_bytes, in_bytes, seconds)
+            out_rates = self._compute_rates(previous.out_bytes, out_bytes, seconds)
+
+            rates = {names[index]: Rate(
+                in_rate,
+                out_rate,
+                (None if bandwidth is None else bandwidth * 1000 * 1000),
                 'snmp',
-                datetime.now())
-                for interface in in_rates}
+                current_time)
+                for index, in_rate, out_rate, bandwidth in zip(indexes, in_rates, out_rates, bandwidths)
+                if in_rate is not None and out_rate is not None}
+            return rates, states
         except EasySNMPTimeoutError:
-            # timeout in easysnmp, return an empty dictionary so we can check next time
+            # timeout in easysnmp, return empty dictionaries so we can check next time
             logging.warn(f"SNMP timeout on {node_name}")
-            return {}
+            return {}, {}
         except SystemError as e:
-            # something catastrophic happened in easysnmp, return an empty dictionary
+            # something catastrophic happened in easysnmp, return empty dictionaries
             if 'returned NULL' in str(e):
                 logging.warn(f"SNMP returned NULL on {node_name}")
             traceback.print_exc()
-            return {}
+            return {}, {}
         except ValueError:
-            # something happened with this particular node, return an empty dictionary
+            # something happened with this particular node, return empty dictionaries
             traceback.print_exc()
-            return {}
+            return {}, {}
 
     def _retrieve_optics(self, node_name):
         """Get optical data from SNMP for a particular node.
@@ -537,12 +685,13 @@ class SNMPPoller(object):
                     continue    # could not unpack interface name and stat name, keep going
 
             # return a dictionary of interfaces, remove interface type and keep numeric ID
-            return {''.join(c for c in interface if c.isdigit() or c == '/'): Optic(
+            current_time = datetime.now()
+            return {interface.translate(_KEEP_TABLE): Optic(
                 float(sorted_optics[interface].get(self.config.OPTIC_RX_SENSOR_NAME, 0)) / 10,
                 float(sorted_optics[interface].get(self.config.OPTIC_TX_SENSOR_NAME, 0)) / 10,
                 float(sorted_optics[interface].get(self.config.OPTIC_LBC_SENSOR_NAME, 0)) / 10,
                 'snmp',
-                datetime.now())
+                current_time)
                 for interface in sorted_optics}
         except EasySNMPTimeoutError:
             # timeout in easysnmp, return an empty dictionary so we can check next time
@@ -555,31 +704,19 @@ class SNMPPoller(object):
             traceback.print_exc()
             return {}
 
-    def _get_link_states(self, node_name):
-        """Get link states for a particular node.
+    def _polled(self, kind, node_name):
+        """Get the latest polling results for a node. This never polls devices, so results are empty until the first
+        poll has finished, and may be stale if the polling loop falls behind.
 
+        :param kind: Data type to read, "rates", "states" or "optics".
         :param node_name: Node name as a string.
-        :returns: A dictionary of State objects keyed by interface names.
+        :returns: A dictionary keyed by interface names.
 
         """
-        if node_name not in self.interface_oids:
-            self._map_interfaces(node_name)
-
-        states = self._query_multiple(node_name, self.config.LINK_STATE_OID)
-        # match interface OIDs to names
-        new_states = {}
-        for int_oid in states:
-            if int_oid not in self.interface_oids[node_name]:
-                continue    # this interface can't be matched, give up
-            state = "unknown"
-            if int(states[int_oid]) == 1:
-                state = "up"
-            elif int(states[int_oid]) == 2:
-                state = "down"
-            # admin status needs yet another OID
-            int_name = self.interface_oids[node_name][int_oid]
-            new_states[int_name] = State(state, 'snmp', datetime.now())
-        return new_states
+        polled = self._poll_cache.peek()
+        if polled is None:
+            return {} # nothing polled yet
+        return polled[kind].get(node_name, {})
 
     def get_rates(self, node_name):
         """Get the most recent rates by node name.
@@ -587,7 +724,7 @@ class SNMPPoller(object):
         :param node_name: Node name as a string.
 
         """
-        return self._rate_cache.get(node_name)
+        return self._polled('rates', node_name)
 
     def get_optics(self, node_name):
         """Get the most recent optics by node name.
@@ -595,7 +732,7 @@ class SNMPPoller(object):
         :param node_name: Node name as a string.
 
         """
-        return self._optic_stat_cache.get(node_name)
+        return self._polled('optics', node_name)
 
     def get_counters(self, node_name):
         """Get the most recent counters by node name.
@@ -612,4 +749,4 @@ class SNMPPoller(object):
         :param node_name: Node name as a string.
 
         """
-        return self._state_cache.get(node_name)
+        return self._polled('states', node_name)
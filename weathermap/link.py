@@ -5,24 +5,111 @@
 #
 # by Danial Ebling (danial@uen.org)
 #
-from collections import namedtuple
+from functools import lru_cache
+from operator import attrgetter
+from typing import NamedTuple, Optional
 
 from datasource import Rate, Optic, Counter, State
 
-class Interface(namedtuple('Interface', 'node,interface,description')):
+# (attribute name, dictionary name) pairs written by Link.asdict(), see API specification for dictionary names
+_ASDICT_FIELDS = tuple((name, name) if ',' not in name else tuple(name.split(',')) for name in (
+    'in_rate,in',
+    'out_rate,out',
+    'state',
+    'bandwidth',
+    'datasource',
+    'datetime',
+    'source_optic_rx,source_receive',
+    'source_optic_tx,source_transmit',
+    'source_optic_lbc,source_lbc',
+    'target_optic_rx,target_receive',
+    'target_optic_tx,target_transmit',
+    'target_optic_lbc,target_lbc',
+    'source_crc_error',
+    'source_in_error,source_input_error',
+    'source_packet_loss',
+    'source_out_drop,source_output_drop',
+    'target_crc_error',
+    'target_in_error,target_input_error',
+    'target_packet_loss',
+    'target_out_drop,target_output_drop',
+))
+
+@lru_cache(maxsize=4096)
+def _fmt_iface(node, interface, description):
+    """Format an interface as a string. Interfaces are immutable, so the same interface always gives the same string.
+
+    :param node: Node name.
+    :param interface: Interface name.
+    :param description: Interface description, or None.
+    :returns: A string like "node interface (description)".
+    """
+    desc = f" ({description})" if description else ""
+    return f"{node} {interface}{desc}"
+
+@lru_cache(maxsize=1024)
+def _fmt_dt(dt):
+    """Format a datapoint time as a local time string. Datapoints from the same poll share one datetime, so this is
+    usually only converted once for all links.
+
+    :param dt: datetime object.
+    :returns: The local time as a string.
+    """
+    return str(dt.astimezone())
+
+def _packet_loss(counter):
+    """Calculate the input packet loss ratio from a Counter.
+
+    :param counter: Counter object.
+    :returns: Input errors divided by received packets, or 0 if no packets were received.
+    """
+    inrx = counter.inrx
+    return counter.inerr / inrx if inrx is not None and inrx > 0 else 0
+
+@lru_cache(maxsize=4096)
+def _iface_asdict(iface):
+    """Get an Interface as a dictionary. The same dictionary is returned for equal interfaces, so it must not be
+    modified.
+
+    :param iface: Interface object.
+    :returns: A dictionary with node, interface and description keys.
+    """
+    return iface._asdict()
+
+class Interface(NamedTuple):
     """An object to describe an interface, with a device/node name and description.
     """
-    __slots__ = ()
+    node: str
+    interface: str
+    description: Optional[str]
+
     def __str__(self):
-        desc = f" ({self.description})" if self.description else ""
-        return f"{self.node} {self.interface}{desc}"
+        return _fmt_iface(*self)
 
-class Link(object):
-    """An object with source and target Interfaces, as well as attributes that describe link details.
+class BaseLink(object):
+    """Link details shared by Links and Remotes: a source Interface, as well as attributes that describe link details.
+    Subclasses add the other end of the link.
     """
-    def __init__(self, source, target):
+    # links are built for every matched interface pair (and every point in time for historic queries), so keep a fixed
+    # set of attributes instead of a per-instance __dict__
+    __slots__ = (
+        'source', 'datasource', 'state', 'in_rate', 'out_rate', 'bandwidth',
+        'source_crc_error', 'source_in_error', 'source_packet_loss', 'source_out_drop',
+        'target_crc_error', 'target_in_error', 'target_packet_loss', 'target_out_drop',
+        'source_optic_rx', 'source_optic_tx', 'source_optic_lbc',
+        'target_optic_rx', 'target_optic_tx', 'target_optic_lbc',
+        'datetime',
+    )
+    # read all attributes in _ASDICT_FIELDS with one call, in the same order as the dictionary names
+    _asdict_values = attrgetter(*(varname for varname, _ in _ASDICT_FIELDS))
+    _asdict_names = tuple(dictname for _, dictname in _ASDICT_FIELDS)
+
+    def __init__(self, source):
         self.source = source
-        self.target = target
+        self.reset()
+
+    def reset(self):
+        """Clear all link data (datasource, state, rates, health, optics and datetime), keeping the link ends."""
         self.datasource = None
         ## other variables that can be used for link data
         # state
@@ -50,58 +137,17 @@ class Link(object):
         # optional date field
         self.datetime = None
 
-        # see API specification for dictionary names
-        self._asdict_list = (
-            'in_rate,in', 
-            'out_rate,out',
-            'state',
-            'bandwidth',
-            'datasource',
-            'datetime',
-            'source_optic_rx,source_receive',
-            'source_optic_tx,source_transmit',
-            'source_optic_lbc,source_lbc',
-            'target_optic_rx,target_receive',
-            'target_optic_tx,target_transmit',
-            'target_optic_lbc,target_lbc',
-            'source_crc_error',
-            'source_in_error,source_input_error',
-            'source_packet_loss',
-            'source_out_drop,source_output_drop',
-            'target_crc_error',
-            'target_in_error,target_input_error',
-            'target_packet_loss',
-            'target_out_drop,target_output_drop',
-        )
-
-    def get(self):
-        """Get the source and target Interface objects.
-        
-        :returns: A 2-tuple of Interface objects.
-        """
-        return (self.source, self.target)
-
-    def get_ends(self):
-        """Get source and target information as a dictionary.
-        
-        :returns: A dictionary with Source and Target dictionaries.
-        """
-        return {
-            "source": self.source._asdict(),
-            "target": self.target._asdict()
-        }
-
     def set_state(self, state):
         """Set interface/link state.
 
         :param state: State namedtuple.
         """
-        if state and isinstance(state, State):
+        if type(state) is State:
             self.state = state.state
             if not self.datasource:
                 self.datasource = state.datasource
             if not self.datetime:
-                self.datetime = str(state.datetime.astimezone())
+                self.datetime = _fmt_dt(state.datetime)
 
     def set_rates(self, rate):
         """Set interface data rates and bandwidth.
@@ -110,12 +156,12 @@ class Link(object):
 
         """
         # rate is the Rate namedtuple from datasource.py
-        if rate and isinstance(rate, Rate):
+        if type(rate) is Rate:
             self.in_rate = rate.in_r
             self.out_rate = rate.out_r
             self.bandwidth = rate.bw
             self.datasource = rate.datasource
-            self.datetime = str(rate.datetime.astimezone())
+            self.datetime = _fmt_dt(rate.datetime)
 
     def set_health(self, srccounter, tgtcounter):
         """Set interface health and error counters.
@@ -123,19 +169,17 @@ class Link(object):
         :param srccounter: Source Counter object.
         :param tgtcounter: Target Counter object.
         """
-        if srccounter and isinstance(srccounter, Counter):
+        if type(srccounter) is Counter:
             self.source_crc_error = srccounter.crc
             self.source_in_error = srccounter.inerr
-            self.source_packet_loss = (srccounter.inerr / srccounter.inrx
-                if srccounter.inrx is not None and srccounter.inrx > 0 else 0)
+            self.source_packet_loss = _packet_loss(srccounter)
             self.source_out_drop = srccounter.outerr
             self.datasource = srccounter.datasource
-            self.datetime = str(srccounter.datetime.astimezone())
-        if tgtcounter and isinstance(tgtcounter, Counter):
+            self.datetime = _fmt_dt(srccounter.datetime)
+        if type(tgtcounter) is Counter:
             self.target_crc_error = tgtcounter.crc
             self.target_in_error = tgtcounter.inerr
-            self.target_packet_loss = (tgtcounter.inerr / tgtcounter.inrx
-                if tgtcounter.inrx is not None and tgtcounter.inrx > 0 else 0)
+            self.target_packet_loss = _packet_loss(tgtcounter)
             self.target_out_drop = tgtcounter.outerr
 
     def set_optics(self, srcoptic, tgtoptic):
@@ -145,13 +189,13 @@ class Link(object):
         :param tgtoptic: Target Optic namedtuple.
         """
         # optic is the Optic namedtuple from datasource.py
-        if srcoptic and isinstance(srcoptic, Optic):
+        if type(srcoptic) is Optic:
             self.source_optic_rx = srcoptic.rx
             self.source_optic_tx = srcoptic.tx
             self.source_optic_lbc = srcoptic.lbc
             self.datasource = srcoptic.datasource
-            self.datetime = str(srcoptic.datetime.astimezone())
-        if tgtoptic and isinstance(tgtoptic, Optic):
+            self.datetime = _fmt_dt(srcoptic.datetime)
+        if type(tgtoptic) is Optic:
             self.target_optic_rx = tgtoptic.rx
             self.target_optic_tx = tgtoptic.tx
             self.target_optic_lbc = tgtoptic.lbc
@@ -163,16 +207,40 @@ class Link(object):
         :param _dict: Existing dictionary.
         :returns: Updated dictionary.
         """
-        for name in self._asdict_list:
-            if len(name.split(',')) == 1:
-                varname = name.split(',')[0]
-                dictname = varname
-            else:
-                varname, dictname = name.split(',')
-            if self.__dict__.get(varname) is not None:
-                _dict[dictname] = self.__dict__.get(varname)
+        for value, dictname in zip(self._asdict_values(self), self._asdict_names):
+            if value is not None:
+                _dict[dictname] = value
         return _dict
 
+    def __repr__(self):
+        return self.__str__()
+
+class Link(BaseLink):
+    """An object with source and target Interfaces, as well as attributes that describe link details.
+    """
+    __slots__ = ('target',)
+
+    def __init__(self, source, target):
+        super().__init__(source)
+        self.target = target
+
+    def get(self):
+        """Get the source and target Interface objects.
+        
+        :returns: A 2-tuple of Interface objects.
+        """
+        return (self.source, self.target)
+
+    def get_ends(self):
+        """Get source and target information as a dictionary.
+        
+        :returns: A dictionary with Source and Target dictionaries.
+        """
+        return {
+            "source": _iface_asdict(self.source),
+            "target": _iface_asdict(self.target)
+        }
+
     def asdict(self):
         """Get this object as a dictionary.
         
@@ -191,29 +259,30 @@ class Link(object):
         :param other: Link to check equality against.
         :returns: True or False.
         """
-        if isinstance(other, self.__class__):
-            return ((self.source == other.source and self.target == other.target) or
-                    (self.source == other.target and self.target == other.source))
-        else:
+        if self is other:
+            return True
+        if not isinstance(other, self.__class__):
             return False
+        source, target = self.source, self.target
+        other_source, other_target = other.source, other.target
+        return ((source == other_source and target == other_target) or
+                (source == other_target and target == other_source))
 
     def __str__(self):
         return f"{self.source} <-> {self.target}"
 
-    def __repr__(self):
-        return self.__str__()
-
     def __hash__(self):
-        # allows use in sets, ignores immutability!
-        return hash(str(self.source) + str(self.target))
+        # allows use in sets, ignores immutability! links are bidirectional like __eq__, so hash the unordered pair
+        return hash(frozenset((self.source, self.target)))
 
-class Remote(Link):
+class Remote(BaseLink):
     """Create a new Remote object with source Interface, and remote description.
     """
+    __slots__ = ('remote',)
+
     def __init__(self, source, remote):
-        super().__init__(source, None)
         # no target for a remote
-        del self.target
+        super().__init__(source)
         self.remote = remote
 
     def get(self):
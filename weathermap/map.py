@@ -8,41 +8,88 @@
 import json
 import logging
 import os
-from flask import Blueprint, send_from_directory, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, send_from_directory
+from functools import partial
+try:
+    # optional, parses and serializes map files faster. orjson.JSONDecodeError is a subclass of json.JSONDecodeError
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = partial(orjson.dumps, option=orjson.OPT_SORT_KEYS)
+except ImportError:
+    json_loads = json.loads
+    json_dumps = lambda obj: json.dumps(obj, sort_keys=True).encode()
 
 from datasource import Cache
 
+# seconds clients (and proxies) can reuse a map file before checking for changes. send_from_directory already adds
+# ETag/Last-Modified and answers conditional requests with 304 Not Modified
+MAP_MAX_AGE = 30
+# threads used to parse changed map files
+MAP_READ_WORKERS = 8
+
 class Maps(object):
     """Static map handler. This generates map lists, reads JSON files, and performs validations."""
     def __init__(self, mapdir, logodir):
         self.mapdir = mapdir
         self.logodir = logodir
         self.mapcache = Cache('mapcache', self.read_maps)
+        self.logocache = Cache('logocache', self.read_logos)
+        # ((modification time, size), name, group) of each map file, so unchanged files aren't parsed again
+        self._file_cache = {}
+        # (mapcache version, map list as JSON), so the list is only serialized again after the cache is refreshed
+        self._maps_json = (None, b'')
     
+    def _parse_map(self, path):
+        """Read the name and group from a map file. This runs in a thread pool.
+
+        :param path: Path to the map file.
+        :returns: A tuple of (name, group), or None if the file isn't valid JSON.
+        """
+        with open(path, 'rb') as mapf:
+            try:
+                mapjson = json_loads(mapf.read())
+            except json.JSONDecodeError as e:
+                logging.warning(f"Invalid JSON in {os.path.basename(path)}: {str(e)}")
+                return None
+        return mapjson.get('name'), mapjson.get('group', "")
+
     def read_maps(self):
-        """Read all maps in the map directory. All verified maps are then sorted into map groups.
+        """Read all maps in the map directory. All verified maps are then sorted into map groups. Files that haven't
+        changed since the last read are not parsed again, and changed files are parsed in parallel.
         
         :returns: A dictionary of maps keyed by group names.
         """
+        with os.scandir(self.mapdir) as entries:
+            # (file name, path, (modification time, size)) for JSON files only. the size also catches files rewritten
+            # within the same modification time tick (coarse timestamps, or editors that keep the modification time)
+            files = [(entry.name, entry.path, (stat.st_mtime_ns, stat.st_size))
+                     for entry in entries if entry.name.endswith('.json') for stat in (entry.stat(),)]
+        changed = [path for _, path, version in files if self._file_cache.get(path, (None,))[0] != version]
+        parsed = {}
+        if changed:
+            with ThreadPoolExecutor(max_workers=MAP_READ_WORKERS) as executor:
+                parsed = dict(zip(changed, executor.map(self._parse_map, changed)))
+
         maps = {} # keyed by groups, maps listed with URL and name
-        for _map in os.listdir(self.mapdir):
-            if not _map.endswith('.json'):
-                continue # skip non-JSON files
-            url = _map.replace('.json', '')
-            
-            with open(os.path.join(self.mapdir, _map)) as mapf:
-                try:
-                    mapjson = json.load(mapf)
-                    if not mapjson.get('name'):
-                        logging.warning(f"Map {_map} has invalid syntax (missing name)")
-                        continue # don't break other maps
-                    group = mapjson.get('group', "")
-                    if group not in maps:
-                        maps[group] = []
-                    maps[group].append((url, mapjson.get('name')))
-                except json.decoder.JSONDecodeError as e:
-                    logging.warning(f"Invalid JSON in {_map}: {str(e)}")
-                    continue # skip this map
+        file_cache = {} # rebuilt every time, so deleted maps are dropped
+        for _map, path, version in files:
+            url = _map[:-5] # strip .json, checked above
+            if path in parsed:
+                if parsed[path] is None:
+                    continue # invalid JSON, skip this map
+                name, group = parsed[path]
+            else:
+                name, group = self._file_cache[path][1:]
+            file_cache[path] = (version, name, group)
+
+            if not name:
+                logging.warning(f"Map {_map} has invalid syntax (missing name)")
+                continue # don't break other maps
+            if group not in maps:
+                maps[group] = []
+            maps[group].append((url, name))
+        self._file_cache = file_cache
 
         # also sort map groups
         for group in maps:
@@ -56,12 +103,32 @@ class Maps(object):
         """
         return self.mapcache.get()
 
+    def get_maps_json(self):
+        """Get the list of maps as JSON.
+
+        :returns: JSON bytes of a dictionary of maps keyed by group names.
+        """
+        # read the version first - if the cache is refreshed in between, the JSON is just serialized again next time
+        version = self.mapcache.version
+        maps = self.get_maps()
+        if self._maps_json[0] != version:
+            self._maps_json = (version, json_dumps(maps))
+        return self._maps_json[1]
+
+    def read_logos(self):
+        """Read all PNG logos in the logo directory.
+
+        :returns: A list of logo names without file extensions.
+        """
+        with os.scandir(self.logodir) as entries:
+            return [entry.name[:-4] for entry in entries if entry.name.endswith('.png') and entry.is_file()]
+
     def get_logos(self):
         """Get a list of logos to be used in map pages.
         
         :returns: A list of logo names without file extensions.
         """
-        return [logo.replace('.png', '') for logo in os.listdir(self.logodir)]
+        return self.logocache.get()
 
 map_api = Blueprint("map", __name__, url_prefix="/map")
 maps = Maps('maps', os.path.join('static', 'images'))
@@ -72,12 +139,12 @@ def load_map(name):
 
     :param name: Name of the map (without .json extension)
     """
-    return send_from_directory('maps', f"{name}.json")
+    return send_from_directory('maps', f"{name}.json", max_age=MAP_MAX_AGE)
 
 @map_api.route('/')
 def map_list():
     """Load the list of maps."""
-    return jsonify(maps.get_maps())
+    return Response(maps.get_maps_json(), mimetype='application/json')
 
 class Uplinks(Maps):
     """Static uplink handler. Bases off of maps, but uses a different caching method and JSON directory."""
@@ -94,9 +161,9 @@ def load_map(name):
 
     :param name: Name of the uplink page (without .json extension)
     """
-    return send_from_directory('uplinks', f"{name}.json")
+    return send_from_directory('uplinks', f"{name}.json", max_age=MAP_MAX_AGE)
 
 @uplink_api.route('/')
 def uplink_list():
     """Load the list of uplinks."""
-    return jsonify(uplinks.get_maps())
+    return Response(uplinks.get_maps_json(), mimetype='application/json')